@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+batch_solve.py
+
+Solve many boards at once on a process pool and stream one JSON object per
+board (JSON Lines) as soon as it is done.
+
+Usage:
+    python batch_solve.py archive/
+    python batch_solve.py "archive/board_202510*.txt" --jobs 4 --timeout 30
+    python batch_solve.py archive/ --output results.jsonl
+
+Each line holds the board path, a status ("ok", "no-solution", "error" or
+"timeout"), the number of outline cells, clusters and configurations, the
+certainly safe and certainly mined cells, the best guess (the undecided cell
+least likely to be a mine) and timings. A board whose numbers deduction
+alone proves contradictory is "no-solution" too, with the contradiction as
+"reason". Boards run in separate worker
+processes (one per core by default); a board that raises or runs past
+--timeout only produces an error line, the rest of the batch goes on. If a
+worker process dies (e.g. out of memory), the boards it may have been
+running are retried one at a time on fresh pools, and only the one that
+kills its worker again is reported as an error.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from fractions import Fraction
+from pathlib import Path
+import argparse
+import glob
+import json
+import os
+import signal
+import sys
+import time
+
+from cluster_store import DEFAULT_PATH as CLUSTER_STORE_PATH, ClusterStore
+from generate_configurations import COUNT_ENGINES, Board, Solver, read_board, solution_board
+
+DEFAULT_TIMEOUT = 60  # seconds per board
+
+_solver = None  # one Solver per worker process, so its component cache is reused
+
+
+class BoardTimeout(Exception):
+    pass
+
+
+class Cancelled(Exception):
+    """Raised by a progress callback to stop solve_rows (status "cancelled")."""
+
+
+def _on_alarm(signum, frame):
+    raise BoardTimeout()
+
+
+def init_worker(engine, cache=None):
+    """Process pool initializer: one Solver per worker, Ctrl-C left to the parent."""
+    global _solver
+    _solver = Solver(engine, store=ClusterStore(cache) if cache else None)
+    # the parent handles Ctrl-C; workers just finish or get torn down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _on_alarm)
+
+
+def find_boards(inputs):
+    """Board files named by directories (their board_*.txt), globs or plain paths."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(Path(item).glob("board_*.txt")))
+        elif glob.has_magic(item):
+            paths.extend(Path(p) for p in sorted(glob.glob(item)))
+        else:
+            paths.append(Path(item))
+    return paths
+
+
+def solve_board(path, mines=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Solve one board file and describe the outcome as a JSON-ready dict.
+    Never raises: failures and timeouts are reported in the result.
+    """
+    return solve_rows(None, mines, timeout, path=path)
+
+
+def solve_rows(rows, mines=None, timeout=DEFAULT_TIMEOUT, details=False, path=None,
+               progress=None):
+    """
+    solve_board for a board given as rows (or read from path). With details
+    the result also holds the solution board ("solution", rows as in
+    combine_configurations.py) and every cell's mine probability, exact
+    ("n/d") and as a float, safest first ("probabilities").
+
+    progress: optional callable receiving event dicts: {"event":
+    "analysing", "message"} as each analysis stage starts or ends (see
+    Board), {"event": "analysed", "outline", "clusters", "sizes"} once the
+    board is split, then per cluster {"event": "progress" | "cluster",
+    "cluster": index, ...} with the search counters (see
+    Solver.count_clusters). Raising Cancelled from it stops the solve with
+    status "cancelled"; during analysis that happens between stages.
+
+    The timeout is only enforced in processes set up by init_worker, which
+    installs the SIGALRM handler; elsewhere an alarm would kill the caller.
+    """
+    result = {"board": str(path)} if path is not None else {}
+    start = time.perf_counter()
+    timed = (bool(timeout) and hasattr(signal, "setitimer")
+             and signal.getsignal(signal.SIGALRM) is _on_alarm)
+    if timed:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        try:
+            _solve_into(result, read_board(Path(path)) if path is not None else rows,
+                        mines, details, progress, start)
+        finally:
+            # inside the handlers below, so an alarm firing just before this is still caught
+            if timed:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except BoardTimeout:
+        result["status"] = "timeout"
+        result["error"] = f"gave up after {timeout} s"
+    except Cancelled:
+        result["status"] = "cancelled"
+    except Exception as e:  # isolate any failure to this board
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result.setdefault("seconds", {})["total"] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def _solve_into(result, rows, mines, details, progress, start):
+    """The body of solve_rows: fill result in for a board given as rows."""
+    solver = _solver if _solver is not None else Solver()
+    try:
+        if progress is None:
+            board = Board(rows)
+        else:  # a chance to cancel between analysis stages
+            board = Board(rows, lambda message: progress({"event": "analysing", "message": message}))
+    except ValueError as e:
+        # deduction already proved the numbers contradictory: the search
+        # would have found no solution either
+        result["status"] = "no-solution"
+        result["reason"] = str(e)
+        result["seconds"] = {"analyse": round(time.perf_counter() - start, 6), "solve": 0}
+        return
+    analysed = time.perf_counter()
+    result["outline"] = len(board.outline)
+    result["clusters"] = len(board.clusters)
+    report = None
+    if progress is not None:
+        progress({"event": "analysed", "outline": len(board.outline),
+                  "clusters": len(board.clusters), "sizes": [len(c) for c in board.clusters]})
+        report = lambda idx, done, stats: progress(
+            dict(stats, event="cluster" if done else "progress", cluster=idx))
+    cluster_counts = solver.count_clusters(board, progress=report)
+    probabilities = None
+    if cluster_counts is not None:
+        probabilities = solver.probabilities(board, mines, cluster_counts)
+    if probabilities is None:
+        result["status"] = "no-solution"
+    else:
+        result["status"] = "ok"
+        total = 1
+        for counts in cluster_counts:
+            total *= sum(n for n, _ in counts.values())
+        result["configurations"] = total
+        result["safe"] = sorted([r, c] for (r, c), p in probabilities.items() if p == 0)
+        result["mines"] = sorted([r, c] for (r, c), p in probabilities.items() if p == 1)
+        undecided = sorted((p, pos) for pos, p in probabilities.items() if 0 < p < 1)
+        if undecided:
+            p, (r, c) = undecided[0]
+            result["best_guess"] = {"cell": [r, c], "mine_probability": float(p)}
+        if details:
+            result["solution"] = solution_board(board.rows, probabilities)
+            result["probabilities"] = [
+                {"cell": [r, c], "mine_probability": float(p),
+                 "exact": f"{Fraction(p).numerator}/{Fraction(p).denominator}"}
+                for p, (r, c) in sorted((p, pos) for pos, p in probabilities.items())]
+    result["seconds"] = {"analyse": round(analysed - start, 6),
+                         "solve": round(time.perf_counter() - analysed, 6)}
+
+
+def solve_on_pool(queue, jobs, args, emit):
+    """
+    Solve the boards of queue (a deque, consumed from the left) on a fresh
+    pool of `jobs` workers, at most `jobs` of them in flight, and pass every
+    result to emit. Returns [] or, when a worker died and broke the pool,
+    the boards that were in flight and got no result (any of them may be
+    the one that killed it); boards not yet submitted stay in queue.
+    """
+    lost = []
+    broken = False
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                             initargs=(args.engine, args.cache)) as pool:
+        running = {}
+        while (queue and not broken) or running:
+            while queue and not broken and len(running) < jobs:
+                path = queue.popleft()
+                try:
+                    running[pool.submit(solve_board, path, args.mines, args.timeout)] = path
+                except BrokenProcessPool:
+                    queue.appendleft(path)
+                    broken = True
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = running.pop(future)
+                try:
+                    emit(future.result())
+                except BrokenProcessPool:
+                    lost.append(path)
+                    broken = True
+                except Exception as e:  # e.g. a result that cannot be sent back
+                    emit({"board": str(path), "status": "error",
+                          "error": f"{type(e).__name__}: {e}"})
+    return lost
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Solve many boards in parallel and stream JSON Lines results.")
+    parser.add_argument("inputs", nargs="+",
+                        help="directories (all board_*.txt inside), glob patterns or board files")
+    parser.add_argument("--jobs", "-j", type=int, default=0,
+                        help="worker processes (0, the default: one per core)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"seconds allowed per board, 0 for no limit (default {DEFAULT_TIMEOUT})")
+    parser.add_argument("--mines", type=int, metavar="N",
+                        help="total number of mines on every board (flags included)")
+    parser.add_argument("--engine", choices=COUNT_ENGINES, default='auto',
+                        help="cluster counter (see generate_configurations.py)")
+    parser.add_argument("--cache", nargs="?", const=str(CLUSTER_STORE_PATH), metavar="PATH",
+                        help="share solved clusters between boards (and runs) through a "
+                             f"persistent store (default {CLUSTER_STORE_PATH})")
+    parser.add_argument("--output", "-o", metavar="FILE",
+                        help="write the JSON Lines here instead of standard output")
+    args = parser.parse_args()
+    if args.jobs < 0:
+        parser.error("--jobs must be 0 (one per core) or more")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+
+    paths = find_boards(args.inputs)
+    if not paths:
+        print("Error: no board files found.", file=sys.stderr)
+        sys.exit(1)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    start = time.perf_counter()
+    status = {}
+
+    def emit(result):
+        status[result["status"]] = status.get(result["status"], 0) + 1
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+    try:
+        queue = deque(paths)
+        while queue:
+            for path in solve_on_pool(queue, args.jobs, args, emit):
+                # alone on its own pool, a board that breaks it is the culprit
+                if solve_on_pool(deque([path]), 1, args, emit):
+                    emit({"board": str(path), "status": "error",
+                          "error": "the worker process died (e.g. out of memory)"})
+    finally:
+        if args.output:
+            out.close()
+
+    summary = ", ".join(f"{n} {name}" for name, n in sorted(status.items()))
+    print(f"Solved {len(paths)} board(s) in {time.perf_counter() - start:.2f} s "
+          f"with {args.jobs} worker(s): {summary}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,19 @@
 import sys
 
-def format_text(filename):
+from configurations_bin import BinaryConfigurations, is_binary
+
+def read_lines(filename, index=0):
+    """Lines to display: the text file itself, or configuration `index` of a .bin file."""
+    if is_binary(filename):
+        with BinaryConfigurations(filename) as configs:
+            if not 0 <= index < len(configs):
+                raise IndexError(index)
+            print(f"Configuration {index} of {len(configs)}")
+            return configs.board_lines(index)
+    with open(filename, 'r') as f:
+        return f.readlines()
+
+def format_text(filename, index=0):
     """Read a text file and format it with emojis and spacing."""
     
     # Emoji mapping
@@ -33,8 +46,7 @@ def format_text(filename):
     }
     
     try:
-        with open(filename, 'r') as f:
-            lines = f.readlines()
+        lines = read_lines(filename, index)
         
         # Process each line
         for line in lines:
@@ -50,15 +62,23 @@ def format_text(filename):
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found.")
         sys.exit(1)
+    except IndexError:
+        print(f"Error: '{filename}' has no configuration {index}.")
+        sys.exit(1)
     except Exception as e:
         print(f"Error reading file: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python board_viewer.py <filename>")
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python board_viewer.py <filename> [configuration index for .bin files]")
         sys.exit(1)
     
     filename = sys.argv[1]
-    format_text(filename)
+    try:
+        index = int(sys.argv[2]) if len(sys.argv) == 3 else 0
+    except ValueError:
+        print(f"Error: configuration index must be a whole number, got '{sys.argv[2]}'.")
+        sys.exit(1)
+    format_text(filename, index)
 
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+board_watcher.py
+
+Wait for new board_*.txt files in a directory.
+
+On Linux the directory is watched with inotify (through ctypes, no extra
+package): a board is reported once the file that wrote it is closed
+(IN_CLOSE_WRITE) or once it is renamed into the directory (IN_MOVED_TO),
+so half-written files are never read. Elsewhere, or when inotify is not
+available, the directory is polled: it is only listed again when its
+mtime moves (a file was created, renamed or deleted), and a new file is
+reported once its size and mtime have stayed the same for one poll.
+
+    with BoardWatcher(".") as watcher:
+        for path in watcher:
+            ...
+"""
+
+from pathlib import Path
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import time
+
+PATTERN = "board_*.txt"
+DEFAULT_POLL_INTERVAL = 0.2  # seconds between directory checks when polling
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; then len bytes of name
+
+
+def _inotify_libc():
+    """libc with the inotify calls, or None when the platform has none."""
+    name = ctypes.util.find_library("c")
+    if name is None:
+        return None
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, "inotify_init1") else None
+
+
+class BoardWatcher:
+    """
+    Iterate over the board files that appear in directory (Path objects, in
+    arrival order), blocking until the next one. poll: force polling with
+    this interval in seconds instead of inotify.
+    """
+
+    def __init__(self, directory=".", poll=None, pattern=PATTERN):
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self.poll_interval = poll or DEFAULT_POLL_INTERVAL
+        self.fd = None
+        libc = None if poll else _inotify_libc()
+        if libc is not None:
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+            if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(self.directory),
+                                                  IN_CLOSE_WRITE | IN_MOVED_TO) >= 0:
+                self.fd = fd
+            elif fd >= 0:
+                os.close(fd)
+        self.mode = "inotify" if self.fd is not None else f"polling every {self.poll_interval} s"
+        # polling state: directory mtime, and (size, mtime) of files not yet reported
+        self._dir_mtime = None
+        self._seen = {entry.name for entry in self._scan()}
+        self._pending = {}
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def latest(self):
+        """The board already in the directory with the greatest name, or None."""
+        names = sorted(entry.name for entry in self._scan())
+        return self.directory / names[-1] if names else None
+
+    def __iter__(self):
+        while True:
+            yield from self.wait()
+
+    def wait(self, timeout=None):
+        """New board paths (possibly none when timeout, in seconds, runs out)."""
+        if self.fd is not None:
+            return self._read_events(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            found = self._poll()
+            if found or (deadline is not None and time.monotonic() >= deadline):
+                return found
+            time.sleep(self.poll_interval)
+
+    def _scan(self):
+        with os.scandir(self.directory) as entries:
+            return [entry for entry in entries
+                    if entry.is_file() and fnmatch.fnmatch(entry.name, self.pattern)]
+
+    def _read_events(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        found = []
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            if fnmatch.fnmatch(name, self.pattern) and self.directory.joinpath(name) not in found:
+                found.append(self.directory / name)
+        return found
+
+    def _poll(self):
+        mtime = os.stat(self.directory).st_mtime_ns
+        if mtime == self._dir_mtime and not self._pending:
+            return []
+        self._dir_mtime = mtime
+        found = []
+        entries = sorted(self._scan(), key=lambda entry: entry.name)
+        names = {entry.name for entry in entries}
+        self._pending = {name: sig for name, sig in self._pending.items() if name in names}
+        self._seen &= names  # a board deleted and written again is new again
+        for entry in entries:
+            if entry.name in self._seen:
+                continue
+            stat = entry.stat()
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self._pending.get(entry.name) == signature:
+                # unchanged for a whole interval: the writer is done
+                del self._pending[entry.name]
+                self._seen.add(entry.name)
+                found.append(Path(entry.path))
+            else:
+                self._pending[entry.name] = signature
+        return found
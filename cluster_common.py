@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+cluster_common.py
+
+Helpers shared by the cluster counting engines (backtracking search in
+generate_configurations, frontier_dp, component_cache) and their samplers.
+
+Kept in a module of its own so the engines can import them without importing
+generate_configurations, which imports the engines.
+"""
+
+PROGRESS_INTERVAL = 10_000  # search nodes between progress callbacks
+
+
+def restrict_constraints(cluster_vars, number_constraints):
+    """
+    The number constraints seen from one cluster.
+
+    Returns [(frozenset of cells, expected)] in the order of
+    number_constraints, each constraint cut down to the cells in cluster_vars;
+    constraints with no cell in the cluster are dropped.
+    """
+    in_cluster = set(cluster_vars)
+    constraints = []
+    for info in number_constraints.values():
+        cells = frozenset(v for v in info['vars'] if v in in_cluster)
+        if cells:
+            constraints.append((cells, info['expected']))
+    return constraints
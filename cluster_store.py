@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+cluster_store.py
+
+Persistent, content-addressed cache of solved clusters (sqlite).
+
+Successive screenshots of one game share most of their clusters, often
+shifted or seen from another orientation. A cluster is stored under the hash
+of a canonical form of its constraint system:
+
+- its cells are moved by each of the 8 symmetries of the grid (rotations
+  and reflections) and translated so the smallest row and column are 0,
+- cells are numbered in sorted order and every constraint becomes
+  (sorted cell numbers, mines expected),
+- the smallest of the 8 resulting systems is the canonical form.
+
+Two clusters with the same form have the same solutions up to renumbering,
+so the stored counts (solutions per mine total and per-cell mine tallies,
+see generate_configurations.count_cluster) and, optionally, the solutions
+themselves are kept in canonical cell order and mapped back on lookup.
+
+Entries remember when they were last used; once the database grows past
+max_bytes of payload the least recently used entries are evicted.
+"""
+
+from pathlib import Path
+import hashlib
+import json
+import sqlite3
+import time
+
+DEFAULT_PATH = Path.home() / ".cache" / "minesweeper-solver" / "clusters.sqlite"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # payload size cap before LRU eviction
+MAX_STORED_SOLUTIONS = 100_000  # larger solution lists are not worth a row
+
+SYMMETRIES = (
+    lambda r, c: (r, c), lambda r, c: (r, -c), lambda r, c: (-r, c), lambda r, c: (-r, -c),
+    lambda r, c: (c, r), lambda r, c: (c, -r), lambda r, c: (-c, r), lambda r, c: (-c, -r),
+)
+
+
+def canonical_form(cells, constraints):
+    """
+    Canonical key of a cluster.
+
+    cells: (row, col) of every cluster cell, in cluster order.
+    constraints: (mask, expected) pairs over that order (bit i = cells[i]).
+    Returns (key, order): key is a hex digest, order[j] the index in cells of
+    canonical cell j.
+    """
+    best = None
+    for symmetry in SYMMETRIES:
+        moved = [symmetry(r, c) for r, c in cells]
+        r0 = min(r for r, _ in moved)
+        c0 = min(c for _, c in moved)
+        moved = [(r - r0, c - c0) for r, c in moved]
+        order = sorted(range(len(cells)), key=moved.__getitem__)
+        rank = [0] * len(cells)
+        for j, i in enumerate(order):
+            rank[i] = j
+        system = (tuple(moved[i] for i in order),
+                  tuple(sorted((tuple(sorted(rank[i] for i in range(len(cells)) if mask >> i & 1)),
+                                expected)
+                               for mask, expected in constraints)))
+        if best is None or system < best[0]:
+            best = (system, order)
+    system, order = best
+    return hashlib.sha256(repr(system).encode("ascii")).hexdigest(), order
+
+
+def _permute_mask(mask, mapping):
+    """Move bit mapping[j] of mask to bit j."""
+    out = 0
+    for j, i in enumerate(mapping):
+        if mask >> i & 1:
+            out |= 1 << j
+    return out
+
+
+class ClusterStore:
+    """sqlite-backed LRU store of cluster counts (and optionally solutions)."""
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # autocommit; the timeout lets several processes share one file
+        self.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.db.execute("CREATE TABLE IF NOT EXISTS clusters ("
+                        "key TEXT PRIMARY KEY, counts TEXT NOT NULL, solutions TEXT, "
+                        "size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS clusters_last_used ON clusters (last_used)")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, cells, constraints, solutions=False):
+        """
+        Look a cluster up. Returns (counts, masks) in cluster order, where
+        masks is the solution list (packed ints over cells) or None when it
+        was not stored or not asked for; None on a miss. With solutions=True
+        an entry without stored solutions counts as a miss.
+        """
+        key, order = canonical_form(cells, constraints)
+        row = self.db.execute("SELECT counts, solutions FROM clusters WHERE key = ?",
+                              (key,)).fetchone()
+        if row is None or (solutions and row[1] is None):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE clusters SET last_used = ? WHERE key = ?", (time.time(), key))
+        position = [0] * len(order)
+        for j, i in enumerate(order):
+            position[i] = j
+        counts = {int(k): [n, [tallies[position[i]] for i in range(len(cells))]]
+                  for k, (n, tallies) in json.loads(row[0]).items()}
+        masks = None
+        if solutions:
+            masks = [_permute_mask(mask, position) for mask in json.loads(row[1])]
+        return counts, masks
+
+    def put(self, cells, constraints, counts, masks=None):
+        """Store a cluster's counts (and solutions, unless there are too many)."""
+        key, order = canonical_form(cells, constraints)
+        payload = json.dumps({k: [n, [tallies[i] for i in order]] for k, (n, tallies) in counts.items()})
+        stored = None
+        if masks is not None and len(masks) <= MAX_STORED_SOLUTIONS:
+            stored = json.dumps([_permute_mask(mask, order) for mask in masks])
+        size = len(payload) + len(stored or "")
+        self.db.execute("INSERT OR REPLACE INTO clusters VALUES (?, ?, ?, ?, ?)",
+                        (key, payload, stored, size, time.time()))
+        self._evict()
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM clusters").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in self.db.execute("SELECT key, size FROM clusters ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self.db.executemany("DELETE FROM clusters WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def stats(self):
+        entries, size = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM clusters").fetchone()
+        return {'entries': entries, 'bytes': size, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
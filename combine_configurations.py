@@ -1,79 +1,270 @@
 from datetime import datetime
 from pathlib import Path
-import sys
+import argparse
+import os
+
+try:
+    import numpy as np
+except ImportError:  # NumPy not installed: fall back to the pure-Python scan
+    np = None
+
+from configurations_bin import CHUNK_BYTES, combine_binary, is_binary
+from generate_configurations import FACTORED_HEADER
+
+
+def iter_boards(filename):
+    """Yield the board configurations of a file one at a time, without reading it whole."""
+    with open(filename, 'r') as f:
+        current_board = []
+        for line in f:
+            line = line.rstrip('\n')
+            if line.strip():
+                current_board.append(line)
+            elif current_board:
+                yield current_board
+                current_board = []
+        if current_board:
+            yield current_board
+
 
 def read_boards(filename):
     """Read all minesweeper board configurations from file."""
-    with open(filename, 'r') as f:
-        content = f.read()
-    
-    # Split by empty lines to separate boards
-    boards = []
-    current_board = []
-    
-    for line in content.split('\n'):
-        if line.strip():
-            current_board.append(line)
-        elif current_board:
-            boards.append(current_board)
-            current_board = []
-    
-    # Add last board if exists
-    if current_board:
-        boards.append(current_board)
-    
-    return boards
+    return list(iter_boards(filename))
+
 
 def find_consistent_cells(boards):
-    """Find cells that are the same across all configurations."""
-    if not boards:
-        return []
-    
-    # Get dimensions from first board
-    height = len(boards[0])
-    width = len(boards[0][0]) if height > 0 else 0
-    
-    # Initialize result board
-    result = []
-    
-    for row_idx in range(height):
-        result_row = []
-        for col_idx in range(width):
-            # Get the character at this position from first board
-            first_char = boards[0][row_idx][col_idx]
-            
-            # Check if all boards have the same character at this position
-            is_consistent = True
-            for board in boards[1:]:
-                if board[row_idx][col_idx] != first_char:
-                    is_consistent = False
-                    break
-            
-            if is_consistent:
-                result_row.append(first_char)
-            else:
-                result_row.append('#')
-        
-        result.append(''.join(result_row))
-    
-    return result
+    """Find cells that are the same across all configurations ('#' where they differ)."""
+    return scan_boards(boards)[0]
+
+
+def scan_boards(boards, classify_only=False):
+    """
+    Single streaming pass over board configurations.
+
+    Keeps the first board as reference, a running set of cells that have
+    differed from it, and mine tallies for the outline cells ('o'/'x' in the
+    reference). Rows identical to the reference row are only counted; other
+    rows are compared character by character. With classify_only the scan
+    stops as soon as every outline cell has varied, and frequencies are not
+    computed.
+
+    Returns (result_board, count, frequencies): count is the number of boards
+    read and frequencies maps (row, col) of outline cells to the fraction of
+    boards with a mine there (None with classify_only).
+    """
+    boards = iter(boards)
+    reference = next(boards, None)
+    if reference is None:
+        return [], 0, {}
+
+    mine_cols = [[c for c, ch in enumerate(row) if ch == 'x'] for row in reference]
+    outline = {(r, c) for r, row in enumerate(reference) for c, ch in enumerate(row) if ch in ('o', 'x')}
+    settled = len(outline)
+    varying = set()
+    same_rows = [1] * len(reference)  # boards whose row r equals the reference row
+    tallies = dict.fromkeys(outline, 0)
+    count = 1
+
+    for board in boards:
+        count += 1
+        for r, (row, ref) in enumerate(zip(board, reference)):
+            if row == ref:
+                same_rows[r] += 1
+                continue
+            for c, (ch, ref_ch) in enumerate(zip(row, ref)):
+                if ch == 'x' and (r, c) in tallies:
+                    tallies[(r, c)] += 1
+                if ch != ref_ch and (r, c) not in varying:
+                    varying.add((r, c))
+                    if (r, c) in outline:
+                        settled -= 1
+        if classify_only and not settled:
+            break
+
+    result = [list(row) for row in reference]
+    for r, c in varying:
+        result[r][c] = '#'
+    result = [''.join(row) for row in result]
+    if classify_only:
+        return result, count, None
+
+    for r, cols in enumerate(mine_cols):
+        for c in cols:
+            tallies[(r, c)] += same_rows[r]
+    return result, count, {pos: t / count for pos, t in tallies.items()}
+
+
+def scan_boards_array(filename, classify_only=False, chunk_bytes=CHUNK_BYTES):
+    """
+    Vectorized counterpart of scan_boards for files written by generate_configurations.py.
+
+    Every configuration there is a fixed-size record (H rows of W characters
+    plus newlines, then a blank line), so chunks of the file map directly onto
+    an (N, H, W) uint8 array. Per chunk, `!= reference` reduced with any()
+    marks varying cells and `== 'x'` summed over boards accumulates the mine
+    heatmap. Only one chunk of at most chunk_bytes is in memory at a time.
+
+    Returns the same (result_board, count, frequencies) as scan_boards, or
+    None when the file is not such a regular stack (the caller should then
+    fall back to scan_boards).
+    """
+    with open(filename, 'rb') as f:
+        first = []
+        for line in f:
+            line = line.rstrip(b'\n')
+            if not line:
+                break
+            first.append(line)
+        if not first or any(len(line) != len(first[0]) for line in first):
+            return None
+        height, width = len(first), len(first[0])
+        record = height * (width + 1) + 1
+        if os.fstat(f.fileno()).st_size % record:
+            return None
+
+        reference = np.frombuffer(b''.join(first), dtype=np.uint8).reshape(height, width)
+        outline = (reference == ord('o')) | (reference == ord('x'))
+        varying = np.zeros((height, width), dtype=bool)
+        tallies = np.zeros((height, width), dtype=np.int64)
+        count = 0
+        per_chunk = max(1, chunk_bytes // record)
+
+        f.seek(0)
+        while True:
+            buf = f.read(per_chunk * record)
+            if not buf:
+                break
+            records = np.frombuffer(buf, dtype=np.uint8).reshape(-1, record)
+            if not (records[:, width:record - 1:width + 1] == ord('\n')).all() \
+                    or not (records[:, -1] == ord('\n')).all():
+                return None
+            boards = records[:, :record - 1].reshape(-1, height, width + 1)[:, :, :width]
+            varying |= (boards != reference).any(axis=0)
+            tallies += (boards == ord('x')).sum(axis=0)
+            count += len(boards)
+            if classify_only and varying[outline].all():
+                break
+
+    result = np.where(varying, ord('#'), reference).astype(np.uint8)
+    result = [bytes(row).decode('ascii') for row in result]
+    if classify_only:
+        return result, count, None
+    heatmap = tallies / count
+    frequencies = {(int(r), int(c)): float(heatmap[r, c]) for r, c in zip(*np.nonzero(outline))}
+    return result, count, frequencies
+
+
+def is_factored(filename):
+    """True if the file was written by generate_configurations.py --factored."""
+    with open(filename, 'r') as f:
+        return f.readline().rstrip('\n') == FACTORED_HEADER
+
+
+def read_factored(filename):
+    """
+    Read a factored configurations file.
+
+    Returns (board, clusters): board is the list of input rows, clusters a list
+    of (cells, solutions) where cells are (row, col) tuples and each solution
+    is a string with one 'x'/'o' per cell.
+    """
+    board = []
+    clusters = []
+    with open(filename, 'r') as f:
+        f.readline()  # header
+        section = None
+        for line in f:
+            line = line.rstrip('\n')
+            if line == "#board":
+                section = board
+            elif line.startswith("#cluster"):
+                cells = [tuple(int(v) for v in cell.split(',')) for cell in line.split()[1:]]
+                clusters.append((cells, []))
+                section = clusters[-1][1]
+            elif line:
+                section.append(line)
+    return board, clusters
+
+
+def combine_factored(board, clusters):
+    """
+    Consistent cells and mine frequencies straight from the factors.
+
+    A cell is consistent across all configurations exactly when it is
+    consistent across its own cluster's solutions, and its mine frequency over
+    all configurations equals its frequency within the cluster.
+
+    Returns (result_board, total, frequencies): frequencies maps (row, col) to
+    the fraction of configurations with a mine there.
+    """
+    result = [list(row) for row in board]
+    total = 1
+    frequencies = {}
+    for cells, solutions in clusters:
+        total *= len(solutions)
+        for i, (r, c) in enumerate(cells):
+            mines = sum(1 for sol in solutions if sol[i] == 'x')
+            frequencies[(r, c)] = mines / len(solutions)
+            result[r][c] = 'x' if mines == len(solutions) else 'o' if mines == 0 else '#'
+    return ["".join(row) for row in result], total, frequencies
+
+
+def expand_factored(filename, outname):
+    """Write the flat one-board-per-configuration file for a factored file."""
+    from generate_configurations import combine_and_write_solutions
+
+    board, clusters = read_factored(filename)
+    outline = [cell for cells, _ in clusters for cell in cells]
+    components = []
+    comp_solutions = []
+    for cells, solutions in clusters:
+        start = sum(len(c) for c in components)
+        comp = list(range(start, start + len(cells)))
+        components.append(comp)
+        comp_solutions.append([dict(zip(comp, sol)) for sol in solutions])
+    combine_and_write_solutions([list(row) for row in board], outline, None,
+                                components, comp_solutions, Path(outname))
+
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python combine_configurations.py configurations_YYYYMMDD_HHMMSS.txt")
-        raise SystemExit(1)
+    parser = argparse.ArgumentParser(
+        description="Combine configurations into a solution board of consistent cells.")
+    parser.add_argument("configurations", help="configurations_YYYYMMDD_HHMMSS.txt (or .bin)")
+    parser.add_argument("--expand", metavar="OUT",
+                        help="for a factored file, write the flat configurations to OUT and exit")
+    parser.add_argument("--classify-only", action="store_true",
+                        help="only find consistent cells: stop reading as soon as every "
+                             "outline cell has varied and skip mine frequencies")
+    args = parser.parse_args()
 
-    filename = sys.argv[1]
+    filename = args.configurations
     path = Path(filename)
-    
-    # Read the file
-    # filename = 'configurations_20251013_094730.txt'
-    boards = read_boards(filename)
-    
-    print(f"Found {len(boards)} board configurations")
-    
-    # Find consistent cells
-    result_board = find_consistent_cells(boards)
+
+    if args.expand:
+        if not is_factored(filename):
+            print(f"'{filename}' is not a factored configurations file")
+            raise SystemExit(1)
+        expand_factored(filename, args.expand)
+        return
+
+    frequencies = None
+    if is_binary(filename):
+        result_board, total, frequencies = combine_binary(filename)
+        print(f"Found {total} board configurations (binary)")
+    elif is_factored(filename):
+        board, clusters = read_factored(filename)
+        result_board, total, frequencies = combine_factored(board, clusters)
+        print(f"Found {total} board configurations in {len(clusters)} cluster factor(s)")
+    else:
+        # Stream the file: one chunk (NumPy) or one board in memory at a time
+        scanned = scan_boards_array(filename, args.classify_only) if np is not None else None
+        if scanned is None:
+            scanned = scan_boards(iter_boards(filename), args.classify_only)
+        result_board, total, frequencies = scanned
+        if args.classify_only:
+            print(f"Scanned {total} board configurations")
+        else:
+            print(f"Found {total} board configurations")
     
     # Print the result
     print("\nConsistent cells (# indicates varying cells):")
@@ -92,6 +283,12 @@ def main():
     
     print(f"\nResult saved to '{outname}'")
 
+    if frequencies is not None:
+        ranked = sorted(frequencies, key=lambda pos: (frequencies[pos], pos))
+        print("Safest cells (row, col): mine %")
+        for pos in ranked[:5]:
+            print(f"  {pos}: {100 * frequencies[pos]:.1f}%")
+
 if __name__ == "__main__":
     main()
 
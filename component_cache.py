@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+component_cache.py
+
+Cluster counter with dynamic component detection and a transposition table,
+in the style of #SAT model counters.
+
+Once a few cells of a cluster are fixed, the remaining constraints often fall
+apart into independent sub-clusters, and the same residual sub-problem shows
+up again under many different prefixes. The counter here:
+
+- simplifies after each decision (substitutes the cell, then settles
+  constraints that need 0 mines or all of their remaining cells),
+- splits what is left into connected components and counts each separately,
+  multiplying the {mines: count} polynomials,
+- looks every component up in a bounded LRU table keyed by its canonical form
+  (sorted tuples of (cells, mines still needed)) before searching it.
+
+The result has the same format as generate_configurations.count_cluster.
+ComponentSampler walks the same decisions to draw uniform solutions of
+clusters too wide for the frontier DP's tables.
+"""
+
+from collections import OrderedDict
+
+from cluster_common import PROGRESS_INTERVAL, restrict_constraints
+from sampling import suffix_products, weighted_choice
+
+DEFAULT_MAX_ENTRIES = 100_000  # transposition table size bound
+
+
+class ComponentCache:
+    """Bounded LRU transposition table: canonical component -> count result."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.table = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        result = self.table.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.table.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        self.table[key] = result
+        self.table.move_to_end(key)
+        while len(self.table) > self.max_entries:
+            self.table.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {'entries': len(self.table), 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
+
+
+def _simplify(constraints, mines, safe):
+    """
+    Settle constraints needing 0 mines or all their cells, to a fixpoint.
+
+    constraints: list of (frozenset cells, need). Settled cells are added to
+    the `mines` / `safe` sets. Returns the remaining constraints, or None on
+    a contradiction.
+    """
+    while True:
+        settled = False
+        remaining = []
+        for cells, need in constraints:
+            hit_mines = cells & mines
+            hit_safe = cells & safe
+            if hit_mines or hit_safe:
+                cells = cells - hit_mines - hit_safe
+                need -= len(hit_mines)
+            if need < 0 or need > len(cells):
+                return None
+            if not cells:
+                continue
+            if need == 0:
+                safe |= cells
+                settled = True
+            elif need == len(cells):
+                mines |= cells
+                settled = True
+            else:
+                remaining.append((cells, need))
+        if not settled:
+            return remaining
+        constraints = remaining
+
+
+def _components(constraints):
+    """Split constraints into groups that share no cells."""
+    owner = {}
+    groups = []
+    for cells, need in constraints:
+        joined = {owner[v] for v in cells if v in owner}
+        group = [(cells, need)]
+        for gi in joined:
+            group.extend(groups[gi])
+            groups[gi] = None
+        gi = len(groups)
+        groups.append(group)
+        for c, _ in group:
+            for v in c:
+                owner[v] = gi
+    return [group for group in groups if group is not None]
+
+
+def _product(a, b):
+    """Combine the results of two independent components."""
+    out = {}
+    for ka, (na, ta) in a.items():
+        for kb, (nb, tb) in b.items():
+            entry = out.get(ka + kb)
+            if entry is None:
+                entry = out[ka + kb] = [0, {}]
+            entry[0] += na * nb
+            tallies = entry[1]
+            for v, t in ta.items():
+                tallies[v] = tallies.get(v, 0) + t * nb
+            for v, t in tb.items():
+                tallies[v] = tallies.get(v, 0) + t * na
+    return out
+
+
+def _with_fixed(result, mines, safe):
+    """Add settled cells to a result: mines count in every solution."""
+    shifted = {}
+    for k, (n, tallies) in result.items():
+        tallies = dict(tallies)
+        for v in mines:
+            tallies[v] = n
+        for v in safe:
+            tallies.setdefault(v, 0)
+        shifted[k + len(mines)] = [n, tallies]
+    return shifted
+
+
+def _count(constraints, cache, stats, progress=None):
+    """Count solutions of residual constraints; result maps k -> [n, {cell: mines}]."""
+    result = {0: [1, {}]}
+    for group in _components(constraints):
+        key = tuple(sorted((tuple(sorted(cells)), need) for cells, need in group))
+        part = cache.get(key)
+        if part is None:
+            part = _count_component(group, cache, stats, progress)
+            cache.put(key, part)
+        if not part:
+            return {}
+        result = _product(result, part)
+    return result
+
+
+def _branch_var(constraints):
+    """The cell _count_component decides first: the one in the most constraints."""
+    occurrences = {}
+    for cells, _ in constraints:
+        for v in cells:
+            occurrences[v] = occurrences.get(v, 0) + 1
+    return max(occurrences, key=lambda v: (occurrences[v], -v))
+
+
+def _count_component(constraints, cache, stats, progress=None):
+    stats['nodes'] += 1
+    if progress is not None and not stats['nodes'] % PROGRESS_INTERVAL:
+        progress(stats)
+    var = _branch_var(constraints)
+
+    total = {}
+    for value in (1, 0):
+        mines, safe = ({var}, set()) if value else (set(), {var})
+        residual = _simplify(constraints, mines, safe)
+        if residual is None:
+            stats['prunes'] += 1
+            continue
+        branch = _with_fixed(_count(residual, cache, stats, progress), mines, safe)
+        for k, (n, tallies) in branch.items():
+            entry = total.get(k)
+            if entry is None:
+                entry = total[k] = [0, {}]
+            entry[0] += n
+            for v, t in tallies.items():
+                entry[1][v] = entry[1].get(v, 0) + t
+    return total
+
+
+def count_cluster_cached(cluster_vars, number_constraints, cache=None, stats=None, progress=None,
+                         assume=None):
+    """
+    Count the solutions of one cluster with component splitting and caching.
+
+    cache: optional ComponentCache shared between clusters (a fresh one is
+    used otherwise); stats: optional dict receiving 'nodes' and 'prunes';
+    progress: optional callable(stats) called every PROGRESS_INTERVAL nodes,
+    which may raise to abandon the count; assume: optional (mines, assigned)
+    bit masks over cluster_vars fixing some cells first, as for
+    generate_configurations._search_cluster (one part of a parallel split).
+
+    Returns a dict mines -> [n_solutions, tallies] where tallies[i] is how many
+    of those solutions put a mine on cluster_vars[i] (see count_cluster).
+    """
+    if cache is None:
+        cache = ComponentCache()
+    if stats is None:
+        stats = {}
+    stats.setdefault('nodes', 0)
+    stats.setdefault('prunes', 0)
+
+    mines, safe = set(), set()
+    if assume is not None:
+        assumed_mines, assigned = assume
+        for i, v in enumerate(cluster_vars):
+            if assigned >> i & 1:
+                (mines if assumed_mines >> i & 1 else safe).add(v)
+    residual = _simplify(restrict_constraints(cluster_vars, number_constraints), mines, safe)
+    if residual is None:
+        return {}
+    result = _with_fixed(_count(residual, cache, stats, progress), mines, safe)
+    return {k: [n, [tallies.get(v, 0) for v in cluster_vars]] for k, (n, tallies) in result.items()}
+
+
+class ComponentSampler:
+    """
+    Exact uniform sampler over the solutions of one cluster with a given
+    number of mines, for clusters too wide for FrontierSampler.
+
+    A sample replays the counter's decisions: mines are split between
+    independent components in proportion to their counts, and each
+    component's branch cell gets a value in proportion to the solutions
+    left on either side. The counts come from the transposition table that
+    counting the cluster filled, so a sample costs a walk down one branch
+    instead of an enumeration of the solutions.
+    """
+
+    def __init__(self, cluster_vars, number_constraints, cache=None):
+        self.cache = cache if cache is not None else ComponentCache()
+        self.stats = {'nodes': 0, 'prunes': 0}
+        self.bits = {v: 1 << i for i, v in enumerate(cluster_vars)}
+        self.mines, safe = set(), set()
+        self.residual = _simplify(restrict_constraints(cluster_vars, number_constraints),
+                                  self.mines, safe)
+        self.counts = {}
+        if self.residual is not None:
+            self.counts = {k + len(self.mines): n
+                           for k, (n, _) in self._count(self.residual).items()}
+
+    def _count(self, constraints):
+        return _count(constraints, self.cache, self.stats)
+
+    def sample(self, mines, rng):
+        """One solution with `mines` mines, as a packed int over cluster_vars."""
+        solution = 0
+        for v in self._sample(self.residual, mines - len(self.mines), rng) | self.mines:
+            solution |= self.bits[v]
+        return solution
+
+    def _sample(self, constraints, mines, rng):
+        """Mined cells of a uniform solution of constraints with `mines` mines."""
+        groups = _components(constraints)
+        parts = [{k: n for k, (n, _) in self._count(group).items()} for group in groups]
+        suffix = suffix_products(parts)
+        chosen = set()
+        for i, (group, part) in enumerate(zip(groups, parts)):
+            later = suffix[i + 1]
+            k = weighted_choice(rng, {k: n * later[mines - k]
+                                      for k, n in part.items() if mines - k in later})
+            chosen |= self._sample_component(group, k, rng)
+            mines -= k
+        return chosen
+
+    def _sample_component(self, constraints, mines, rng):
+        var = _branch_var(constraints)
+        options = {}
+        for value in (1, 0):
+            fixed, safe = ({var}, set()) if value else (set(), {var})
+            residual = _simplify(constraints, fixed, safe)
+            if residual is None:
+                continue
+            need = mines - len(fixed)
+            entry = self._count(residual).get(need)
+            if entry is not None and entry[0]:
+                options[value] = (residual, fixed, need, entry[0])
+        residual, fixed, need, _ = options[weighted_choice(
+            rng, {value: option[3] for value, option in options.items()})]
+        return self._sample(residual, need, rng) | fixed
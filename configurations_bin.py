@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+configurations_bin.py
+
+Compact binary configurations format (`configurations_YYYYMMDD_HHMMSS.bin`).
+
+A text configurations file repeats the whole board for every configuration,
+roughly H*(W+1)+1 bytes each, although only the outline cells change. The
+binary file stores the board once and then one bit per outline cell:
+
+    header   struct '<4sBHHIQ': magic b'MSCF', version, height, width,
+             number of outline cells n, number of configurations
+    board    height*width bytes, the input board (ASCII, no newlines)
+    cells    n pairs of uint16 (row, col): the outline cells in bit order
+    records  one ceil(n/8)-byte record per configuration; bit i (byte i//8,
+             bit i%8, least significant first) is set when cell i is a mine
+
+Records are fixed-width, so configuration k is a slice at a known offset.
+BinaryConfigurations maps the file with mmap and hands out zero-copy
+memoryview slices; NumPy, when installed, views all records as one array.
+"""
+
+from pathlib import Path
+import itertools
+import mmap
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # NumPy not installed: records are decoded one by one
+    np = None
+
+MAGIC = b'MSCF'
+VERSION = 1
+HEADER = struct.Struct('<4sBHHIQ')
+WRITE_BUFFER = 1 << 20  # bytes collected before each write
+CHUNK_BYTES = 64 * 1024 * 1024  # how much of a configurations file a NumPy scan holds at once
+
+
+def write_binary_configurations(board, cells, cluster_masks, outpath, first_k=None):
+    """
+    Write every combination of per-cluster solutions as bit-packed records
+    (only the first first_k combinations when given).
+
+    board: list of rows (lists or strings) of the input board.
+    cells: list of (row, col) giving the bit order.
+    cluster_masks: one list per cluster of solutions as ints over that bit
+    order (clusters must use disjoint bits).
+    Returns the number of configurations written. Raises ValueError, before
+    the output file is opened, if the board is not plain ASCII.
+    """
+    try:
+        board_bytes = ''.join(''.join(row) for row in board).encode('ascii')
+    except UnicodeEncodeError as e:
+        raise ValueError(f"the binary format stores the board as ASCII, found {e.object[e.start]!r}") from None
+    total = 1
+    for masks in cluster_masks:
+        total *= len(masks)
+    if first_k is not None:
+        total = min(total, first_k)
+    record = (len(cells) + 7) // 8
+    with Path(outpath).open('wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(board), len(board[0]) if board else 0,
+                            len(cells), total))
+        f.write(board_bytes)
+        for r, c in cells:
+            f.write(struct.pack('<HH', r, c))
+        buf = bytearray()
+        for combo in itertools.islice(itertools.product(*cluster_masks), first_k):
+            mines = 0
+            for mask in combo:
+                mines |= mask
+            buf += mines.to_bytes(record, 'little')
+            if len(buf) >= WRITE_BUFFER:
+                f.write(buf)
+                buf.clear()
+        f.write(buf)
+    return total
+
+
+def is_binary(filename):
+    """True if the file starts with the binary configurations magic."""
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class BinaryConfigurations:
+    """Read-only, memory-mapped view of a binary configurations file."""
+
+    def __init__(self, filename):
+        self._file = open(filename, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, version, self.height, self.width, ncells, self.count = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"'{filename}' is not a version {VERSION} binary configurations file")
+        offset = HEADER.size
+        board = bytes(self._view[offset:offset + self.height * self.width]).decode('ascii')
+        self.board = [board[r * self.width:(r + 1) * self.width] for r in range(self.height)]
+        offset += self.height * self.width
+        self.cells = [struct.unpack_from('<HH', self._map, offset + 4 * i) for i in range(ncells)]
+        self.records_offset = offset + 4 * ncells
+        self.record_size = (ncells + 7) // 8
+
+    def close(self):
+        """
+        Release the map. While a caller still holds a record() view the map
+        cannot be closed; it is then left to be freed with the last view.
+        """
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def record(self, k):
+        """Zero-copy memoryview of the packed bits of configuration k."""
+        if not 0 <= k < self.count:
+            raise IndexError(k)
+        start = self.records_offset + k * self.record_size
+        return self._view[start:start + self.record_size]
+
+    def mines(self, k):
+        """Configuration k as an int: bit i set when cells[i] is a mine."""
+        return int.from_bytes(self.record(k), 'little')
+
+    def board_lines(self, k):
+        """Configuration k rendered like a text configuration (outline as 'x'/'o')."""
+        rows = [list(row) for row in self.board]
+        mines = self.mines(k)
+        for i, (r, c) in enumerate(self.cells):
+            rows[r][c] = 'x' if mines >> i & 1 else 'o'
+        return [''.join(row) for row in rows]
+
+    def mine_bits(self, start=0, stop=None):
+        """Records start..stop (default: all) unpacked to an (N, n) uint8 NumPy array of 0/1."""
+        stop = self.count if stop is None else min(stop, self.count)
+        records = np.frombuffer(self._map, dtype=np.uint8, count=(stop - start) * self.record_size,
+                                offset=self.records_offset + start * self.record_size)
+        records = records.reshape(stop - start, self.record_size)
+        return np.unpackbits(records, axis=1, count=len(self.cells), bitorder='little')
+
+    def tallies(self, chunk_bytes=CHUNK_BYTES):
+        """How many configurations put a mine on each cell, in cells order."""
+        if np is not None:
+            totals = np.zeros(len(self.cells), dtype=np.int64)
+            chunk = max(1, chunk_bytes // max(1, len(self.cells)))  # records per chunk
+            for start in range(0, self.count, chunk):
+                totals += self.mine_bits(start, start + chunk).sum(axis=0, dtype=np.int64)
+            return [int(t) for t in totals]
+        tallies = [0] * len(self.cells)
+        for k in range(self.count):
+            mines = self.mines(k)
+            while mines:
+                low = mines & -mines
+                tallies[low.bit_length() - 1] += 1
+                mines ^= low
+        return tallies
+
+
+def combine_binary(filename):
+    """
+    Consistent board and mine frequencies of a binary configurations file.
+
+    Returns (result_board, count, frequencies) like
+    combine_configurations.scan_boards.
+    """
+    with BinaryConfigurations(filename) as configs:
+        tallies = configs.tallies()
+        result = [list(row) for row in configs.board]
+        frequencies = {}
+        for (r, c), t in zip(configs.cells, tallies):
+            result[r][c] = 'x' if t == configs.count else 'o' if t == 0 else '#'
+            frequencies[(r, c)] = t / configs.count if configs.count else 0.0
+        return [''.join(row) for row in result], configs.count, frequencies
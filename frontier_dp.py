@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+frontier_dp.py
+
+Dynamic-programming cluster counter for long, thin outlines.
+
+Backtracking is exponential in the number of cells of a cluster, but on a
+minesweeper frontier each cell only interacts with a handful of neighbours.
+This module orders the cluster's cells along the frontier (reverse
+Cuthill-McKee over the variable graph, which walks a chain from one end to the
+other) and sweeps that order once, keeping as state only the partial mine
+counts of the constraints that are "open" at the current cut: those with some
+cells on each side. A constraint is checked when its last cell is assigned and
+dropped from the state afterwards.
+
+Each state carries a polynomial {mines so far: number of ways}; a backward
+sweep over the same states gives the completions, and forward x backward at
+each cell yields how many solutions put a mine there. Cost is linear in the
+cluster size and exponential only in the frontier width (number of open
+constraints), so clusters of 100+ cells are cheap.
+
+The result has the same format as generate_configurations.count_cluster.
+The same tables, walked backwards, draw uniform solutions (FrontierSampler).
+"""
+
+from collections import defaultdict, deque
+
+from cluster_common import restrict_constraints
+from sampling import multiply_mine_polynomials, weighted_choice
+
+
+def frontier_order(cluster_vars, constraint_sets):
+    """
+    Order cluster variables along the frontier (reverse Cuthill-McKee).
+
+    constraint_sets: list of sets of variable indices.
+    Starts from a pseudo-peripheral cell (the far end of a BFS) so that a
+    chain is walked from one end to the other.
+    """
+    adj = {v: set() for v in cluster_vars}
+    for cells in constraint_sets:
+        for v in cells:
+            adj[v].update(cells)
+    for v in cluster_vars:
+        adj[v].discard(v)
+
+    def bfs(start):
+        seen = {start}
+        order = [start]
+        queue = deque([start])
+        while queue:
+            u = queue.popleft()
+            for w in sorted(adj[u] - seen, key=lambda w: (len(adj[w]), w)):
+                seen.add(w)
+                order.append(w)
+                queue.append(w)
+        return order
+
+    order = []
+    remaining = set(cluster_vars)
+    while remaining:
+        start = min(remaining, key=lambda v: (len(adj[v]), v))
+        start = bfs(start)[-1]  # one BFS to find the far end of the component
+        part = bfs(start)
+        order.extend(part)
+        remaining.difference_update(part)
+    order.reverse()
+    return order
+
+
+def _add_shifted(target, poly, shift):
+    for k, n in poly.items():
+        target[k + shift] = target.get(k + shift, 0) + n
+
+
+def frontier_width(cluster_vars, number_constraints):
+    """Largest number of constraints open at any cut of frontier_order."""
+    constraints = restrict_constraints(cluster_vars, number_constraints)
+    order = frontier_order(cluster_vars, [cells for cells, _ in constraints])
+    layers = _layers(order, constraints)
+    return max((len(layer) for layer in layers), default=0)
+
+
+def _layers(order, constraints):
+    """
+    layers[t]: indices of constraints open before cell order[t] is assigned.
+
+    One sweep: a constraint opens after its first cell in the order and
+    closes after its last, so the cost is the size of the layers.
+    """
+    position = {v: t for t, v in enumerate(order)}
+    opening = [[] for _ in range(len(order) + 1)]
+    closing = [[] for _ in range(len(order) + 1)]
+    for ci, (cells, _) in enumerate(constraints):
+        first = min(position[v] for v in cells)
+        last = max(position[v] for v in cells)
+        if first < last:
+            opening[first + 1].append(ci)
+            closing[last + 1].append(ci)
+    layers = []
+    active = set()
+    for t in range(len(order) + 1):
+        active.difference_update(closing[t])
+        active.update(opening[t])
+        layers.append(sorted(active))
+    return layers
+
+
+def _forward(cluster_vars, number_constraints):
+    """
+    Forward sweep shared by the counter and the sampler.
+
+    Returns (order, step, forward): step(t, state, x) is the state after
+    giving order[t] the value x (None if a constraint breaks), and forward[t]
+    maps each reachable state before step t to its {mines so far: ways}.
+    """
+    constraints = restrict_constraints(cluster_vars, number_constraints)
+    order = frontier_order(cluster_vars, [cells for cells, _ in constraints])
+    n = len(order)
+    layers = _layers(order, constraints)
+    position = {v: t for t, v in enumerate(order)}
+    last = [max(position[v] for v in cells) for cells, _ in constraints]
+
+    # per step: constraints containing the cell, and how many of each
+    # constraint's cells are still unassigned after it
+    touching = [[] for _ in range(n)]
+    for ci, (cells, _) in enumerate(constraints):
+        for v in cells:
+            touching[position[v]].append(ci)
+    remaining_after = [{ci: sum(1 for v in constraints[ci][0] if position[v] > t)
+                        for ci in touching[t]}
+                       for t in range(n)]
+
+    def step(t, state, x):
+        counts = dict(zip(layers[t], state))
+        for ci in touching[t]:
+            counts[ci] = counts.get(ci, 0) + x
+        for ci in touching[t]:
+            expected = constraints[ci][1]
+            c = counts[ci]
+            if c > expected or c + remaining_after[t][ci] < expected:
+                return None
+            if last[ci] == t and c != expected:
+                return None
+        return tuple(counts[ci] for ci in layers[t + 1])
+
+    forward = [{(): {0: 1}}]
+    for t in range(n):
+        nxt = {}
+        for state, poly in forward[t].items():
+            for x in (1, 0):
+                ns = step(t, state, x)
+                if ns is not None:
+                    _add_shifted(nxt.setdefault(ns, {}), poly, x)
+        forward.append(nxt)
+    return order, step, forward
+
+
+def count_cluster_dp(cluster_vars, number_constraints):
+    """
+    Count the solutions of one cluster by dynamic programming over the frontier.
+
+    Returns a dict mines -> [n_solutions, tallies] where tallies[i] is how many
+    of those solutions put a mine on cluster_vars[i] (see count_cluster).
+    """
+    order, step, forward = _forward(cluster_vars, number_constraints)
+    n = len(order)
+    if () not in forward[n]:
+        return {}
+
+    backward = [None] * n + [{(): {0: 1}}]
+    for t in range(n - 1, -1, -1):
+        layer = {}
+        for state in forward[t]:
+            poly = {}
+            for x in (1, 0):
+                ns = step(t, state, x)
+                if ns is not None and ns in backward[t + 1]:
+                    _add_shifted(poly, backward[t + 1][ns], x)
+            if poly:
+                layer[state] = poly
+        backward[t] = layer
+
+    result = {k: [count, [0] * n] for k, count in forward[n][()].items()}
+    index = {v: i for i, v in enumerate(cluster_vars)}
+    for t in range(n):
+        i = index[order[t]]
+        for state, poly in forward[t].items():
+            ns = step(t, state, 1)
+            if ns is None or ns not in backward[t + 1]:
+                continue
+            for k, ways in multiply_mine_polynomials(poly, backward[t + 1][ns]).items():
+                result[k + 1][1][i] += ways
+    return result
+
+
+class FrontierSampler:
+    """
+    Exact uniform sampler over the solutions of one cluster with a given
+    number of mines.
+
+    The forward tables already hold, for every state, how many ways lead to
+    it with each mine total. A sample walks them backwards from the final
+    state: at each step it picks a predecessor (state, value of the cell)
+    with probability proportional to the ways of reaching that predecessor
+    with the mines still to place, so every solution is equally likely and
+    nothing is rejected.
+    """
+
+    def __init__(self, cluster_vars, number_constraints):
+        self.order, step, self.forward = _forward(cluster_vars, number_constraints)
+        self.counts = dict(self.forward[-1].get((), {}))
+        index = {v: i for i, v in enumerate(cluster_vars)}
+        self.bits = [1 << index[v] for v in self.order]
+        # predecessors[t]: state after step t -> [(state before, value), ...]
+        self.predecessors = []
+        for t in range(len(self.order)):
+            back = defaultdict(list)
+            for state in self.forward[t]:
+                for x in (1, 0):
+                    ns = step(t, state, x)
+                    if ns is not None:
+                        back[ns].append((state, x))
+            self.predecessors.append(back)
+
+    def sample(self, mines, rng):
+        """One solution with `mines` mines, as a packed int over cluster_vars."""
+        state, left, solution = (), mines, 0
+        for t in range(len(self.order) - 1, -1, -1):
+            options = {}
+            for prev, x in self.predecessors[t][state]:
+                ways = self.forward[t][prev].get(left - x, 0)
+                if ways:
+                    options[(prev, x)] = ways
+            state, x = weighted_choice(rng, options)
+            if x:
+                solution |= self.bits[t]
+                left -= 1
+        return solution
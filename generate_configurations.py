@@ -6,6 +6,15 @@ Improved Minesweeper outline configuration generator.
 
 Usage:
     python generate_configurations.py board_YYYYMMDD_HHMMSS.txt
+    python generate_configurations.py --count-only board_YYYYMMDD_HHMMSS.txt
+    python generate_configurations.py --mines 99 board_YYYYMMDD_HHMMSS.txt
+    python generate_configurations.py --factored board_YYYYMMDD_HHMMSS.txt
+    python generate_configurations.py --binary board_YYYYMMDD_HHMMSS.txt
+    python generate_configurations.py --first-k 10 board_YYYYMMDD_HHMMSS.txt
+    python generate_configurations.py --sample 1000 board_YYYYMMDD_HHMMSS.txt
+    python generate_configurations.py --classify board_YYYYMMDD_HHMMSS.txt
+    python generate_configurations.py --jobs 0 board_YYYYMMDD_HHMMSS.txt
+    python generate_configurations.py --previous state_YYYYMMDD_HHMMSS.json board_YYYYMMDD_HHMMSS.txt
 
 What changed (major improvements):
 - Splits the outline (unknown cells adjacent to numbers) into independent clusters
@@ -15,13 +24,83 @@ What changed (major improvements):
   - For any numbered cell we check partial assignments: if assigned mines exceed
     the expected count, or even when assigning all remaining neighbors cannot
     reach the expected count, we prune immediately.
+  - Constraints that become tight force their remaining cells (unit
+    propagation), the next cell is picked from the constraint with the fewest
+    completions, and failures backjump over unrelated decisions. Node, prune,
+    propagation and backjump counters are printed per cluster.
+- In count-only mode, large clusters are counted by frontier_dp.py instead: a
+  dynamic program along the frontier whose cost is linear in the cluster size
+  and exponential only in the number of constraints open at once. Clusters
+  too wide for it go to component_cache.py, which splits the residual
+  problem into independent components during search and memoizes them in a
+  bounded LRU table. `--engine` forces one counter for every cluster.
 - Writes configurations progressively to avoid holding everything in memory.
 - Safety check to refuse explosion when final number of configurations is
   astronomically large (configurable threshold).
+- `--factored` writes each cluster's solutions once, with the cells they
+  cover, instead of the Cartesian product: the file is additive in the cluster
+  solution counts and MAX_COMBINATIONS_WARN no longer applies.
+- `--binary` writes `configurations_YYYYMMDD_HHMMSS.bin` instead: the board
+  and outline cells once, then one bit-packed record per configuration.
+- Cluster solutions come from a lazy generator (iter_cluster_solutions):
+  `--factored` streams them straight to disk, the flat formats refuse as soon
+  as one cluster alone passes MAX_COMBINATIONS_WARN, and `--first-k K` stops
+  each cluster after K solutions and writes at most K configurations.
+- `--classify` answers only "which cells are certain": per cell, one search
+  for a solution giving it the value no solution found so far has shown
+  (classify_cluster). Each witness also marks every other cell it covers; a
+  search that fails settles the cell.
+- `--sample K` handles boards whose configurations are too many to write:
+  sampling.py draws K of them exactly uniformly from the per-cluster counts
+  (weighted by the sea placements with `--mines`), without enumeration or
+  rejection, and writes Monte-Carlo mine probabilities with 95% Wilson
+  intervals. Each cluster's sampler comes from the engine `--engine` picks.
+- `--count-only` keeps per-cluster counts (solutions per mine total and how
+  often each variable is a mine) instead of materializing configurations, and
+  writes the solution board plus exact per-cell mine probabilities directly.
+  Cost is the sum of the cluster solution counts rather than their product.
+- `--mines N` makes the probabilities aware of the total mine count: cluster
+  counts are combined by a dynamic program over the number of mines and each
+  total is weighted by the ways to place the remaining mines in the "sea" of
+  unknown cells away from numbers (which also gets a probability).
+- `--jobs N` searches big clusters on N processes: split_cluster fixes the
+  highest-degree cells to every combination of values, the sub-problems
+  go to a ProcessPoolExecutor one at a time (several per worker, so uneven
+  sub-trees balance out) and results are merged in split order. This applies
+  to the enumeration (default and `--binary`) and to `--count-only` clusters
+  on the search or component-cache engine; frontier-DP clusters are cheap
+  and stay in one process, and `--factored`, `--classify`, `--sample` and
+  `--first-k` do not use it.
+- `--cache` keeps solved clusters in a sqlite store (cluster_store.py) keyed
+  by a canonical form of their constraints that ignores translation,
+  rotation and reflection, so the next screenshot of the same game only
+  solves the clusters that changed.
+- `--previous STATE` re-solves the next board of a game incrementally:
+  Board.update diffs it against the board saved in state_*.json (written
+  by `--save-state`), rebuilds the outline and number constraints only
+  within one cell of a change, re-runs the deductions and cluster split
+  only on the regions those reach, and the other clusters keep their saved
+  counts.
+- Board and Solver wrap the whole flow (outline -> clusters -> solve ->
+  combine) for in-process use, e.g. by pipeline.py; they keep all state on
+  the instance, so several boards can be solved from one process.
+- Before searching, a propagation pass settles cells that follow directly from
+  the numbers (all-safe / all-mine constraints and subset differences) and
+  re-splits the clusters on what is left. When NumPy is installed,
+  linear_deduction.py then row-reduces the whole constraint matrix to settle
+  cells only combinations of constraints reveal, and bounds each cluster's
+  mine count.
 
 Output:
 - If input is `board_YYYYMMDD_HHMMSS.txt`, output will be
   `configurations_YYYYMMDD_HHMMSS.txt`.
+- With `--classify`: only `solution_YYYYMMDD_HHMMSS.txt`.
+- With `--count-only`: `solution_YYYYMMDD_HHMMSS.txt` (same format as
+  combine_configurations.py) and `probabilities_YYYYMMDD_HHMMSS.txt` with one
+  `row col probability` line per outline cell (and sea cell with `--mines`),
+  safest first. With `--sample K`: K sampled configurations, and
+  probabilities lines with a `low high` 95% interval appended. With
+  `--save-state` or `--previous`, also `state_YYYYMMDD_HHMMSS.json`.
 
 Schema:
 - Input symbols: digits '0'-'6', '!' flagged mine, '.' unknown/unvisited, '?'
@@ -31,13 +110,37 @@ Schema:
 
 """
 
-from collections import defaultdict, deque
+from contextlib import contextmanager
 from datetime import datetime
+from fractions import Fraction
+from math import comb
 from pathlib import Path
+import argparse
 import itertools
-import sys
+import json
+import os
+import random
+
+from cluster_common import PROGRESS_INTERVAL, restrict_constraints
+from cluster_store import DEFAULT_PATH as CLUSTER_STORE_PATH, ClusterStore
+from component_cache import ComponentCache, ComponentSampler, count_cluster_cached
+from configurations_bin import WRITE_BUFFER, write_binary_configurations
+from frontier_dp import FrontierSampler, count_cluster_dp, frontier_width
+from sampling import (ConfigurationSampler, EnumeratedSampler, SampleStatistics,
+                      draw_configurations, multiply_mine_polynomials, suffix_products)
+
+try:
+    from linear_deduction import gauss_deductions, mine_count_bounds
+except ImportError:  # NumPy not installed: skip the linear-algebra stage
+    gauss_deductions = mine_count_bounds = None
 
 MAX_COMBINATIONS_WARN = 10_000_000  # warn / abort beyond this many total combinations
+DP_MIN_CLUSTER_SIZE = 20  # count clusters at least this big with the frontier DP ...
+DP_MAX_FRONTIER_WIDTH = 16  # ... unless more constraints than this are open at once
+COUNT_ENGINES = ('auto', 'search', 'dp', 'cache')
+PARALLEL_MIN_CLUSTER_SIZE = 30  # with --jobs, search clusters this big on a process pool
+PARALLEL_SPLIT_FACTOR = 4  # sub-problems per worker, so faster workers take more of them
+STATE_VERSION = 1  # format of the state_*.json files (save_state / load_state)
 
 
 '''
@@ -95,7 +198,7 @@ def build_variable_index(outline):
     return {pos: idx for idx, pos in enumerate(outline)}
 
 
-def build_constraint_graph(outline, numbers, var_index):
+def build_constraint_graph(outline, numbers, var_index, board):
     # For each number cell, determine which outline variables touch it
     nvars = len(var_index)
     num_neighbors = {}  # (r,c) -> list of var indices touching it
@@ -157,173 +260,1502 @@ def prepare_number_constraints(num_neighbors, board):
     return prepared
 
 
-def solve_cluster(cluster_vars, var_pos_map, number_constraints):
+def propagate_constraints(number_constraints, fixed=None):
+    """
+    Settle outline cells that need no search, repeating until nothing changes.
+
+    Rules:
+    - a constraint expecting 0 mines makes all its cells safe, one expecting as
+      many mines as it has cells makes them all mines;
+    - settled cells are removed from every constraint (mines lower `expected`);
+    - when one constraint's cells are a subset of another's, the superset is
+      replaced by the difference with expected_B - expected_A;
+    - empty and duplicate constraints are dropped.
+
+    fixed: optional var index -> 'x'/'o' of cells already known to be settled.
+
+    Returns (fixed, reduced): fixed maps var index -> 'x' or 'o', reduced is a
+    dict in the same format as number_constraints holding what is left.
+    Raises ValueError when the constraints contradict each other.
+    """
+    fixed = dict(fixed or {})
+    constraints = {pos: (frozenset(info['vars']), info['expected'])
+                   for pos, info in number_constraints.items()}
+
+    changed = True
+    while changed:
+        changed = False
+
+        # substitute settled cells and apply the all-safe / all-mine rules
+        for pos, (cells, expected) in list(constraints.items()):
+            settled = [vid for vid in cells if vid in fixed]
+            if settled:
+                expected -= sum(1 for vid in settled if fixed[vid] == 'x')
+                cells = cells.difference(settled)
+            if expected < 0 or expected > len(cells):
+                raise ValueError(f"Inconsistent board: constraint at {pos} cannot be satisfied")
+            if cells and (expected == 0 or expected == len(cells)):
+                sym = 'o' if expected == 0 else 'x'
+                for vid in cells:
+                    fixed[vid] = sym
+                cells = frozenset()
+                changed = True
+            if not cells:
+                del constraints[pos]
+            else:
+                constraints[pos] = (cells, expected)
+        if changed:
+            continue
+
+        # drop duplicates, then apply the subset rule
+        seen = {}
+        for pos, (cells, expected) in list(constraints.items()):
+            if cells in seen:
+                if seen[cells] != expected:
+                    raise ValueError(f"Inconsistent board: constraint at {pos} cannot be satisfied")
+                del constraints[pos]
+            else:
+                seen[cells] = expected
+        ordered = sorted(constraints.items(), key=lambda item: len(item[1][0]))
+        for i, (pos_a, (cells_a, expected_a)) in enumerate(ordered):
+            for pos_b, _ in ordered[i + 1:]:
+                cells_b, expected_b = constraints[pos_b]
+                if len(cells_a) < len(cells_b) and cells_a < cells_b:
+                    constraints[pos_b] = (cells_b - cells_a, expected_b - expected_a)
+                    changed = True
+            if changed:
+                break
+
+    reduced = {pos: {'expected': expected, 'vars': sorted(cells)}
+               for pos, (cells, expected) in constraints.items()}
+    return fixed, reduced
+
+
+def build_reduced_graph(nvars, number_constraints):
+    """Variable graph (as in build_constraint_graph) for already prepared constraints."""
+    g = [[] for _ in range(nvars)]
+    for info in number_constraints.values():
+        for a, b in itertools.combinations(info['vars'], 2):
+            g[a].append(b)
+            g[b].append(a)
+    return g
+
+
+def cluster_masks(cluster_vars, number_constraints):
+    """
+    Restrict the number constraints to one cluster and encode them as bitmasks.
+
+    Bit i of every mask stands for cluster_vars[i]. Returns a list of
+    (mask, expected) pairs, one per numbered cell touching the cluster.
+    """
+    position = {vid: i for i, vid in enumerate(cluster_vars)}
+    return [(sum(1 << position[vid] for vid in cells), expected)
+            for cells, expected in restrict_constraints(cluster_vars, number_constraints)]
+
+
+def iter_mask_bits(mask):
+    """Yield the indices of the set bits of mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def new_search_stats():
+    """Counters filled in by the cluster search (see _search_cluster)."""
+    return {'nodes': 0, 'prunes': 0, 'propagated': 0, 'backjumps': 0}
+
+
+def _search_cluster(cluster_vars, number_constraints, stats=None, assume=None, progress=None):
+    """
+    DPLL-style search over one cluster; a generator yielding every solution.
+
+    cluster_vars: list of variable indices belonging to the cluster
+    number_constraints: dict keyed by (r,c) -> {'expected', 'vars'} for all number cells
+                        (only those that reference variables in this cluster matter)
+    stats: optional dict from new_search_stats(); counts search nodes, pruned
+           branches, cells forced by propagation and backjumps
+    assume: optional (mines, assigned) packed ints fixing some cells before
+            the search starts (only solutions agreeing with them are yielded)
+    progress: optional callable(stats) called every PROGRESS_INTERVAL nodes;
+              it may raise to abandon the search (cooperative cancellation)
+
+    The whole search state lives in two ints: `mines` (bit i set when
+    cluster_vars[i] is a mine) and `assigned` (bit i set once cluster_vars[i]
+    has a value); constraints (mask, expected) are checked with popcounts.
+
+    - Unit propagation: after every assignment, each constraint touching the
+      new cells is re-checked; one that has all its mines (or needs all its
+      free cells) forces the rest of its cells.
+    - Branching picks a free cell of the constraint with the fewest remaining
+      completions, C(free cells, mines still needed).
+    - Conflict-directed backjumping: every assigned cell remembers the set of
+      decisions it depends on (a bitmask of decision levels). When the first
+      branch of a decision fails for reasons that do not involve that
+      decision, the second branch would fail the same way and is skipped.
+    """
+    constraints = cluster_masks(cluster_vars, number_constraints)
+    nvars = len(cluster_vars)
+    full = (1 << nvars) - 1
+    if stats is None:
+        stats = new_search_stats()
+
+    # Precompute for each variable which constraints it participates in
+    var_constraints = [[] for _ in range(nvars)]
+    for ci, (mask, _) in enumerate(constraints):
+        for i in iter_mask_bits(mask):
+            var_constraints[i].append(ci)
+
+    # decision levels each assigned variable depends on (stale once unassigned)
+    depends = [0] * nvars
+
+    def reason(mask, assigned):
+        why = 0
+        for i in iter_mask_bits(mask & assigned):
+            why |= depends[i]
+        return why
+
+    def propagate(mines, assigned, pending):
+        # returns (mines, assigned, conflict); conflict is None when consistent
+        while pending:
+            touched = set()
+            for i in iter_mask_bits(pending):
+                touched.update(var_constraints[i])
+            pending = 0
+            for ci in touched:
+                mask, expected = constraints[ci]
+                free = mask & ~assigned
+                need = expected - (mines & mask).bit_count()
+                nfree = free.bit_count()
+                if need < 0 or need > nfree:
+                    stats['prunes'] += 1
+                    return mines, assigned, reason(mask, assigned)
+                if free and (need == 0 or need == nfree):
+                    why = reason(mask, assigned)
+                    for i in iter_mask_bits(free):
+                        depends[i] = why
+                    assigned |= free
+                    if need:
+                        mines |= free
+                    pending |= free
+                    stats['propagated'] += nfree
+        return mines, assigned, None
+
+    def search(level, mines, assigned, pending):
+        # returns None if at least one solution was found, else the conflict set
+        stats['nodes'] += 1
+        if progress is not None and not stats['nodes'] % PROGRESS_INTERVAL:
+            progress(stats)
+        mines, assigned, conflict = propagate(mines, assigned, pending)
+        if conflict is not None:
+            return conflict
+        if assigned == full:
+            yield mines
+            return None
+
+        best_options, best_free = None, 0
+        for mask, expected in constraints:
+            free = mask & ~assigned
+            if free:
+                options = comb(free.bit_count(), expected - (mines & mask).bit_count())
+                if best_options is None or options < best_options:
+                    best_options, best_free = options, free
+        i = max(iter_mask_bits(best_free), key=lambda j: len(var_constraints[j]))
+        bit = 1 << i
+        level_bit = 1 << level
+
+        # try mine first, then safe
+        depends[i] = level_bit
+        first = yield from search(level + 1, mines | bit, assigned | bit, bit)
+        if first is not None and not first & level_bit:
+            stats['backjumps'] += 1
+            return first
+        depends[i] = level_bit
+        second = yield from search(level + 1, mines, assigned | bit, bit)
+        if first is None or second is None:
+            return None
+        return (first | second) & ~level_bit
+
+    if assume:
+        mines, assigned = assume
+        yield from search(0, mines, assigned, assigned)
+    else:
+        yield from search(0, 0, 0, full)
+
+
+def iter_cluster_solutions(cluster_vars, number_constraints, stats=None, first_k=None, limit=None):
+    """
+    Lazily yield the solutions of one cluster as packed ints (bit i set when
+    cluster_vars[i] is a mine); nothing is kept once a solution is yielded.
+
+    first_k: stop after the first k solutions (interactive use).
+    limit: raise RuntimeError as soon as the cluster turns out to have more
+           than `limit` solutions, instead of enumerating them all first.
+
+    For counts and per-cell tallies without yielding anything, use count_cluster.
+    """
+    for n, mines in enumerate(_search_cluster(cluster_vars, number_constraints, stats), 1):
+        if limit is not None and n > limit:
+            raise RuntimeError(f"Cluster has more than {limit} solutions")
+        yield mines
+        if first_k is not None and n >= first_k:
+            return
+
+
+def enumerate_cluster(cluster_vars, number_constraints, visit, stats=None, assume=None,
+                      progress=None):
+    """Call visit(mines) for every solution of the cluster (see _search_cluster)."""
+    for mines in _search_cluster(cluster_vars, number_constraints, stats, assume, progress):
+        visit(mines)
+
+
+def format_search_stats(stats):
+    return ", ".join(f"{name}={value}" for name, value in stats.items())
+
+
+def solve_cluster_masks(cluster_vars, number_constraints, stats=None):
+    """Return every solution of the cluster as a packed int (see enumerate_cluster)."""
+    solutions = []
+    enumerate_cluster(cluster_vars, number_constraints, solutions.append, stats)
+    return solutions
+
+
+def solve_cluster(cluster_vars, var_pos_map, number_constraints, stats=None):
     """
     cluster_vars: list of variable indices belonging to the cluster
     var_pos_map: maps var index -> position (r,c)
     number_constraints: dict keyed by (r,c) -> {'expected', 'vars'} for all number cells
                         (only those that reference variables in this cluster matter)
+    stats: optional search counters, see _search_cluster
 
     Returns a list of solutions, each is dict var_index -> 'x' or 'o'
     """
-    # Restrict constraints to those that mention any variable in this cluster
-    vars_set = set(cluster_vars)
-    relevant_numbers = {}
-    for k, v in number_constraints.items():
-        # intersection
-        inter = [vid for vid in v['vars'] if vid in vars_set]
-        if inter:
-            relevant_numbers[k] = {'expected': v['expected'], 'vars': inter}
+    return [{vid: 'x' if mines >> i & 1 else 'o' for i, vid in enumerate(cluster_vars)}
+            for mines in solve_cluster_masks(cluster_vars, number_constraints, stats)]
+
+
+def count_cluster(cluster_vars, number_constraints, stats=None, assume=None, progress=None):
+    """
+    Count-only counterpart of solve_cluster: solutions are tallied as they are
+    found and never stored.
 
-    # For pruning we will maintain for each numbered constraint:
-    #  assigned_mines, assigned_safe, unassigned_count (within this cluster)
+    Returns a dict mines -> [n_solutions, tallies] where `mines` is the number of
+    mines the solution places in the cluster and tallies[i] is how many of those
+    solutions put a mine on cluster_vars[i]. An empty dict means no solution.
+    progress: as in _search_cluster, but the stats passed on also hold
+    'solutions', the number found so far.
+    """
+    counts = {}
+    report = None
+    if progress is not None:
+        report = lambda stats: progress(dict(stats, solutions=sum(n for n, _ in counts.values())))
+    enumerate_cluster(cluster_vars, number_constraints,
+                      lambda mines: _tally(counts, mines, len(cluster_vars)), stats, assume, report)
+    return counts
+
+
+def _tally(counts, mines, nvars):
+    k = mines.bit_count()
+    entry = counts.get(k)
+    if entry is None:
+        entry = counts[k] = [0, [0] * nvars]
+    entry[0] += 1
+    tallies = entry[1]
+    for i in iter_mask_bits(mines):
+        tallies[i] += 1
+
+
+def tally_solutions(solutions, nvars):
+    """count_cluster's result for an explicit list of packed solutions."""
+    counts = {}
+    for mines in solutions:
+        _tally(counts, mines, nvars)
+    return counts
+
+
+def split_cluster(cluster_vars, number_constraints, parts):
+    """
+    Split the search tree of a cluster into at least `parts` sub-problems.
+
+    The k highest-degree cells (those in the most constraints) are given
+    every combination of values, mine first as in the search; each
+    combination is an `assume` for _search_cluster. Together the
+    sub-problems cover every solution exactly once; combinations that break
+    a constraint just come back empty.
+    """
+    degree = [0] * len(cluster_vars)
+    for mask, _ in cluster_masks(cluster_vars, number_constraints):
+        for i in iter_mask_bits(mask):
+            degree[i] += 1
+    k = min(len(cluster_vars), max(0, parts - 1).bit_length())
+    top = sorted(range(len(cluster_vars)), key=lambda i: (-degree[i], i))[:k]
+    assigned = sum(1 << i for i in top)
+    return [(sum(1 << i for i, x in zip(top, values) if x), assigned)
+            for values in itertools.product((1, 0), repeat=k)]
+
+
+def _local_constraints(cluster_vars, number_constraints):
+    """Only the constraints touching the cluster (less to ship to workers)."""
+    return {i: {'vars': sorted(cells), 'expected': expected}
+            for i, (cells, expected)
+            in enumerate(restrict_constraints(cluster_vars, number_constraints))}
+
+
+def _count_part(cluster_vars, number_constraints, assume):
+    stats = new_search_stats()
+    return count_cluster(cluster_vars, number_constraints, stats, assume), stats
+
+
+_part_cache = None  # one ComponentCache per worker process, shared by its parts
 
-    # Precompute for each variable which numbered constraints it participates in
-    var_to_numbers = {vid: [] for vid in cluster_vars}
-    for num_pos, info in relevant_numbers.items():
-        for vid in info['vars']:
-            var_to_numbers[vid].append(num_pos)
 
-    # order variables heuristically: by degree (most constrained first)
-    var_order = sorted(cluster_vars, key=lambda v: -len(var_to_numbers[v]))
+def _count_cached_part(cluster_vars, number_constraints, assume):
+    global _part_cache
+    if _part_cache is None:
+        _part_cache = ComponentCache()
+    before = _part_cache.stats()
+    stats = {}
+    counts = count_cluster_cached(cluster_vars, number_constraints, _part_cache, stats,
+                                  assume=assume)
+    after = _part_cache.stats()
+    stats['hits'] = after['hits'] - before['hits']
+    stats['misses'] = after['misses'] - before['misses']
+    return counts, stats
 
+
+def _solve_part(cluster_vars, number_constraints, assume, limit):
+    stats = new_search_stats()
     solutions = []
+    for n, mines in enumerate(_search_cluster(cluster_vars, number_constraints, stats, assume), 1):
+        if limit is not None and n > limit:
+            raise RuntimeError(f"Cluster has more than {limit} solutions")
+        solutions.append(mines)
+    return solutions, stats
 
-    # state for numbers
-    number_state = {num_pos: {'assigned_mines': 0, 'assigned_safe': 0, 'unassigned': len(info['vars'])}
-                    for num_pos, info in relevant_numbers.items()}
 
-    assign = {}
+def _run_parts(work, cluster_vars, number_constraints, workers, extra=()):
+    """Run work(cluster_vars, constraints, assume, *extra) over the split, in order."""
+    from concurrent.futures import ProcessPoolExecutor
 
-    def backtrack(i=0):
-        if i == len(var_order):
-            # found a full assignment consistent with constraints
-            solutions.append(assign.copy())
-            return
-        vid = var_order[i]
-
-        # try assign 'x' (mine) and 'o' (safe)
-        for sym in ('x', 'o'):
-            inconsistent = False
-            touched = []
-            for num_pos in var_to_numbers[vid]:
-                st = number_state[num_pos]
-                # update
-                st['unassigned'] -= 1
-                if sym == 'x':
-                    st['assigned_mines'] += 1
-                else:
-                    st['assigned_safe'] += 1
-                touched.append(num_pos)
-
-                expected = relevant_numbers[num_pos]['expected']
-                am = st['assigned_mines']
-                un = st['unassigned']
-                # prune conditions:
-                # - assigned mines > expected
-                # - even if all remaining are mines, assigned_mines + unassigned < expected
-                if am > expected or (am + un) < expected:
-                    inconsistent = True
-                    break
-
-            if not inconsistent:
-                assign[vid] = sym
-                backtrack(i + 1)
-                del assign[vid]
-
-            # revert updates
-            for num_pos in touched:
-                st = number_state[num_pos]
-                if sym == 'x':
-                    st['assigned_mines'] -= 1
-                else:
-                    st['assigned_safe'] -= 1
-                st['unassigned'] += 1
-
-        # end for sym
-
-    backtrack(0)
+    workers = workers or os.cpu_count() or 1
+    constraints = _local_constraints(cluster_vars, number_constraints)
+    assumptions = split_cluster(cluster_vars, constraints, PARALLEL_SPLIT_FACTOR * workers)
+    n = len(assumptions)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # chunksize=1: idle workers pick up the next sub-problem as soon as
+        # they finish, so uneven sub-trees balance out; map keeps the order
+        return list(pool.map(work, [cluster_vars] * n, [constraints] * n, assumptions,
+                             *[[value] * n for value in extra], chunksize=1))
+
+
+def _merge_stats(stats, parts):
+    if stats is not None:
+        for _, part_stats in parts:
+            for name, value in part_stats.items():
+                stats[name] = stats.get(name, 0) + value
+
+
+def count_cluster_parallel(cluster_vars, number_constraints, workers=None, stats=None,
+                           engine='search'):
+    """
+    count_cluster (engine 'search') or count_cluster_cached (engine 'cache',
+    each worker keeping one ComponentCache for all its parts) on a process
+    pool: the search tree is cut by split_cluster and the sub-problem counts
+    are added up in split order, so the result (and stats) do not depend on
+    scheduling.
+    """
+    work = _count_cached_part if engine == 'cache' else _count_part
+    parts = _run_parts(work, cluster_vars, number_constraints, workers)
+    _merge_stats(stats, parts)
+    counts = {}
+    for part, _ in parts:
+        for k, (n, tallies) in part.items():
+            entry = counts.get(k)
+            if entry is None:
+                entry = counts[k] = [0, [0] * len(cluster_vars)]
+            entry[0] += n
+            entry[1] = [a + b for a, b in zip(entry[1], tallies)]
+    return counts
+
+
+def solve_cluster_masks_parallel(cluster_vars, number_constraints, workers=None, stats=None,
+                                 limit=None):
+    """
+    solve_cluster_masks on a process pool (see count_cluster_parallel); the
+    solutions come back grouped by sub-problem in split order. limit: as in
+    iter_cluster_solutions, checked per sub-problem and on the total.
+    """
+    parts = _run_parts(_solve_part, cluster_vars, number_constraints, workers, (limit,))
+    _merge_stats(stats, parts)
+    solutions = [mines for part, _ in parts for mines in part]
+    if limit is not None and len(solutions) > limit:
+        raise RuntimeError(f"Cluster has more than {limit} solutions")
     return solutions
 
 
-def combine_and_write_solutions(board, outline, var_index, components, comp_solutions, outpath):
+def classify_cluster(cluster_vars, number_constraints, stats=None):
+    """
+    Settle the cells of one cluster without enumerating its solutions.
+
+    One search finds a first solution, which witnesses one value of every
+    cell. Then, for each cell still seen only one way, a search with that
+    cell assumed to be the other value looks for a single witness; when it
+    finds one, the witness also marks every other cell it shows both ways,
+    and when it proves there is none, the cell is settled. The cost is at
+    most one satisfiability check per cell instead of visiting every solution.
+
+    Returns a list with 'x' (always a mine), 'o' (always safe) or '#'
+    (varies) per entry of cluster_vars, or None if the cluster has no solution.
+    """
+    full = (1 << len(cluster_vars)) - 1
+    first = next(_search_cluster(cluster_vars, number_constraints, stats), None)
+    if first is None:
+        return None
+    seen_mine, seen_safe = first, full & ~first
+    for i in range(len(cluster_vars)):
+        bit = 1 << i
+        if seen_mine & seen_safe & bit:
+            continue
+        assume = (0 if seen_mine & bit else bit, bit)
+        witness = next(_search_cluster(cluster_vars, number_constraints, stats, assume), None)
+        if witness is not None:
+            seen_mine |= witness
+            seen_safe |= full & ~witness
+    both = seen_mine & seen_safe
+    return ['#' if both >> i & 1 else 'x' if seen_mine >> i & 1 else 'o'
+            for i in range(len(cluster_vars))]
+
+
+def cluster_probabilities(cluster_vars, counts):
+    """Exact mine probability (Fraction) for every variable of one cluster."""
+    total = sum(n for n, _ in counts.values())
+    mined = [0] * len(cluster_vars)
+    for _, tallies in counts.values():
+        for i, t in enumerate(tallies):
+            mined[i] += t
+    return {vid: Fraction(mined[i], total) for i, vid in enumerate(cluster_vars)}
+
+
+def find_sea(board, outline):
+    """Unknown cells ('.' or '?') that touch no number: the unconstrained 'sea'."""
+    outline_set = set(outline)
+    return [(r, c) for r, row in enumerate(board) for c, ch in enumerate(row)
+            if ch in ('.', '?') and (r, c) not in outline_set]
+
+
+def global_probabilities(components, cluster_counts, sea_count, mines_left):
+    """
+    Combine per-cluster counts under a known number of remaining mines.
+
+    Each cluster contributes a polynomial {mines: n_solutions}; a dynamic program
+    over the mine total multiplies them, and a total of k outline mines is
+    weighted by C(sea_count, mines_left - k), the number of ways to place the
+    rest in the sea. All arithmetic is on Python ints, so expert boards stay
+    exact. For every cluster the product of the *other* clusters is obtained
+    from prefix/suffix products, keeping the work linear in the number of
+    clusters.
+
+    Returns (probabilities, sea_probability) where probabilities maps
+    var index -> Fraction, or None if no configuration fits mines_left.
+    """
+    polys = [{k: n for k, (n, _) in counts.items()} for counts in cluster_counts]
+    prefix = [{0: 1}]
+    for poly in polys:
+        prefix.append(multiply_mine_polynomials(prefix[-1], poly))
+    suffix = suffix_products(polys)
+
+    def weight(k):
+        rest = mines_left - k
+        return comb(sea_count, rest) if 0 <= rest <= sea_count else 0
+
+    total = sum(n * weight(k) for k, n in prefix[-1].items())
+    if total == 0:
+        return None
+
+    sea_mines = sum(n * weight(k) * (mines_left - k) for k, n in prefix[-1].items())
+    sea_probability = Fraction(sea_mines, total * sea_count) if sea_count else None
+
+    probabilities = {}
+    for idx, (comp, counts) in enumerate(zip(components, cluster_counts)):
+        others = multiply_mine_polynomials(prefix[idx], suffix[idx + 1])
+        mined = [0] * len(comp)
+        for k, (_, tallies) in counts.items():
+            w = sum(n * weight(k + j) for j, n in others.items())
+            if w:
+                for i, t in enumerate(tallies):
+                    mined[i] += t * w
+        for i, vid in enumerate(comp):
+            probabilities[vid] = Fraction(mined[i], total)
+    return probabilities, sea_probability
+
+
+def solution_board(board, cell_probabilities):
+    """
+    Build the board combine_configurations.py would produce: cells that are a
+    mine in every configuration become 'x', never a mine 'o', otherwise '#'.
+    Cells missing from cell_probabilities are copied unchanged.
+    """
+    result = [row[:] for row in board]
+    for (r, c), p in cell_probabilities.items():
+        result[r][c] = 'o' if p == 0 else 'x' if p == 1 else '#'
+    return ["".join(row) for row in result]
+
+
+@contextmanager
+def atomic_open(outpath):
+    """
+    Open outpath for writing text through a temporary file in the same
+    directory that replaces it only once complete, so a reader (e.g. the
+    web viewer polling for results) never sees a half-written file.
+    """
+    outpath = Path(outpath)
+    tmp = outpath.with_name(f".{outpath.name}.tmp")
+    try:
+        with tmp.open("w", encoding="utf-8") as f:
+            yield f
+        os.replace(tmp, outpath)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def save_solution_board(result_board, outpath):
+    """Print a solution board and save it in combine_configurations.py's format."""
+    print("\nConsistent cells (# indicates varying cells):")
+    print()
+    for row in result_board:
+        print(row)
+    with atomic_open(outpath) as f:
+        for row in result_board:
+            f.write(row + "\n")
+        f.write("\n")
+    print(f"\nResult saved to '{outpath}'")
+
+
+def write_probabilities(cell_probabilities, outpath, intervals=None):
+    """
+    Write one `row col probability` line per cell, safest first. With
+    intervals (pos -> (low, high)) each line also gets `low high`.
+    """
+    ranked = sorted(cell_probabilities, key=lambda pos: (cell_probabilities[pos], pos))
+    with atomic_open(outpath) as f:
+        for r, c in ranked:
+            line = f"{r} {c} {float(cell_probabilities[(r, c)]):.6f}"
+            if intervals is not None:
+                lo, hi = intervals[(r, c)]
+                line += f" {lo:.6f} {hi:.6f}"
+            f.write(line + "\n")
+    return ranked
+
+
+def render_template(board, outline):
+    """
+    Render one configuration record (board rows, then a blank line) into a
+    bytearray and return it with the byte offset of every outline cell (by
+    var index), so writers only patch the outline.
+    """
+    record = bytearray()
+    row_starts = []
+    for row in board:
+        row_starts.append(len(record))
+        record += ("".join(row) + "\n").encode("utf-8")
+    record += b"\n"
+    offset = {}
+    for vid, (r, c) in enumerate(outline):
+        offset[vid] = row_starts[r] + len("".join(board[r][:c]).encode("utf-8"))
+    return record, offset
+
+
+def combine_and_write_solutions(board, outline, var_index, components, comp_solutions, outpath,
+                                first_k=None):
+    """
+    Write every combination of cluster solutions as a text board (only the
+    first first_k combinations when given).
+
+    The board is rendered once into a bytearray and the byte offset of every
+    outline cell is precomputed; each combination only patches the cells of
+    the clusters whose solution changed since the previous one (itertools.product
+    varies the last cluster fastest), and the records are collected into a
+    buffer that is written out in WRITE_BUFFER-sized chunks.
+    """
     # comp_solutions is list of lists (for each component) where each solution is dict var->'x'/'o'
     counts = [len(lst) for lst in comp_solutions]
     total = 1
     for c in counts:
         total *= c
-        if total > MAX_COMBINATIONS_WARN:
-            raise RuntimeError(f"Refusing to produce >{MAX_COMBINATIONS_WARN} combined solutions ({total})")
+    if first_k is not None:
+        total = min(total, first_k)
+    if total > MAX_COMBINATIONS_WARN:
+        raise RuntimeError(f"Refusing to produce >{MAX_COMBINATIONS_WARN} combined solutions ({total})")
 
     print(f"Writing {total} combined solutions to {outpath} ...")
 
-    # create a template copy
-    base = [row[:] for row in board]
+    record, offset = render_template(board, outline)
 
-    with outpath.open("w", encoding="utf-8") as f:
-        for combo in itertools.product(*comp_solutions):
-            # combo is a tuple of solution dicts (one per component)
-            b = [row[:] for row in base]
-            for sol in combo:
-                for vid, sym in sol.items():
-                    r, c = outline[vid]
-                    b[r][c] = sym
-            # write board
-            for row in b:
-                f.write("".join(row) + "\n")
-            f.write("\n")
+    # per cluster solution: the offsets to patch and the bytes to put there
+    patches = [[(tuple(offset[vid] for vid in sol), "".join(sol.values()).encode("ascii"))
+                for sol in sols]
+               for sols in comp_solutions]
+
+    buf = bytearray()
+    previous = [None] * len(patches)
+    with outpath.open("wb") as f:
+        for combo in itertools.islice(itertools.product(*patches), first_k):
+            for i, patch in enumerate(combo):
+                if patch is not previous[i]:
+                    previous[i] = patch
+                    for off, ch in zip(*patch):
+                        record[off] = ch
+            buf += record
+            if len(buf) >= WRITE_BUFFER:
+                f.write(buf)
+                buf.clear()
+        f.write(buf)
 
     print("Done.")
 
 
+def write_sampled_configurations(board, outline, components, configurations, outpath):
+    """
+    Stream configurations given as one packed int per component (bit i set
+    when components[k][i] is a mine) to a text configurations file.
+    Returns the number of configurations written.
+    """
+    record, offset = render_template(board, outline)
+    cells = [[offset[vid] for vid in comp] for comp in components]
+    written = 0
+    buf = bytearray()
+    with outpath.open("wb") as f:
+        for solutions in configurations:
+            for offsets, mines in zip(cells, solutions):
+                for i, off in enumerate(offsets):
+                    record[off] = 120 if mines >> i & 1 else 111  # 'x' / 'o'
+            buf += record
+            written += 1
+            if len(buf) >= WRITE_BUFFER:
+                f.write(buf)
+                buf.clear()
+        f.write(buf)
+    return written
+
+
+FACTORED_HEADER = "#factored 1"  # first line of --factored output (read by combine_configurations)
+
+
+def write_factored_solutions(board, outline, components, comp_solutions, outpath):
+    """
+    Write the configurations as independent factors instead of their product.
+
+    Layout (read back by combine_configurations.read_factored):
+        #factored 1
+        #board
+        <the input board rows>
+        #cluster <r>,<c> <r>,<c> ...
+        <one line per cluster solution: 'x'/'o' for each listed cell>
+        ...
+
+    comp_solutions holds one iterable per component of packed ints (bit i set
+    when components[k][i] is a mine). They are consumed lazily, so generators
+    from iter_cluster_solutions stream straight to the file.
+
+    Every configuration is one choice of line per cluster, so the file grows
+    with the sum of the cluster solution counts, not their product.
+    Returns the number of solutions written for each component.
+    """
+    print(f"Writing {len(components)} cluster factor(s) to {outpath} ...")
+
+    counts = []
+    with outpath.open("w", encoding="utf-8") as f:
+        f.write(FACTORED_HEADER + "\n#board\n")
+        for row in board:
+            f.write("".join(row) + "\n")
+        for comp, sols in zip(components, comp_solutions):
+            f.write("#cluster " + " ".join(f"{r},{c}" for r, c in (outline[v] for v in comp)) + "\n")
+            n = 0
+            for mines in sols:
+                f.write("".join('x' if mines >> i & 1 else 'o' for i in range(len(comp))) + "\n")
+                n += 1
+            counts.append(n)
+
+    total = 1
+    for n in counts:
+        total *= n
+    print(f"Done ({total} combined solutions).")
+    return counts
+
+
+def _quiet(*args):
+    pass
+
+
+def deduce(number_constraints, log=_quiet):
+    """
+    Propagation, then (with NumPy) Gaussian elimination until neither
+    settles anything more.
+
+    Returns (fixed, reduced, system): fixed maps var index -> 'x'/'o',
+    reduced holds the constraints left (as in propagate_constraints) and
+    system is the reduced matrix per block of constraints (see
+    gauss_deductions), or None without NumPy.
+    Raises ValueError when the constraints contradict each other.
+    """
+    system = None
+    ncells = len({vid for info in number_constraints.values() for vid in info['vars']})
+    log("propagating deterministic deductions...")
+    fixed, constraints = propagate_constraints(number_constraints)
+    log(f"settled {len(fixed)} of {ncells} outline cell(s) by propagation")
+    if gauss_deductions is not None:
+        log("row-reducing the constraint matrix...")
+        settled = len(fixed)
+        while True:
+            forced, system = gauss_deductions(constraints)
+            if not forced:
+                break
+            fixed, constraints = propagate_constraints(constraints, forced | fixed)
+        log(f"settled {len(fixed) - settled} more outline cell(s) by linear algebra")
+    return fixed, constraints, system
+
+
+class Board:
+    """
+    A board analysed up to its independent clusters.
+
+    rows: the board as a list of rows (strings or lists of characters).
+    log: optional callable receiving progress messages (e.g. print).
+
+    Attributes: rows, outline (sorted (r, c) list; var index = position),
+    numbers, var_index, prepared (the number constraints before deductions),
+    constraints (prepared, after deductions), fixed (var index -> 'x'/'o'
+    settled by propagation and linear algebra), system (the reduced matrices,
+    or None without NumPy; after update() only of the re-analysed regions),
+    clusters (lists of var indices of the cells still open) and reused (see
+    update()).
+
+    Everything is kept on the instance, so boards can be analysed side by
+    side. Raises ValueError when the numbers contradict each other.
+    """
+
+    def __init__(self, rows, log=_quiet):
+        self.rows = [list(row) for row in rows]
+        log("finding outline and number cells...")
+        self.outline, self.numbers = find_outline_and_numbers(self.rows)
+        log(f"found outline containing {len(self.outline)} cells")
+        self.var_index = build_variable_index(self.outline)
+        self.prepared, self.constraints, self.fixed, self.system, self.clusters = {}, {}, {}, None, []
+        self.reused = {}
+        if not self.outline:
+            return
+
+        log("building constraint graph...")
+        _, num_neighbors = build_constraint_graph(self.outline, self.numbers, self.var_index, self.rows)
+        # numeric constraints (expected counts after accounting for flagged '!')
+        self.prepared = prepare_number_constraints(num_neighbors, self.rows)
+        self.fixed, self.constraints, self.system = deduce(self.prepared, log)
+
+        log("computing connected components of the outline (clusters)...")
+        graph = build_reduced_graph(len(self.outline), self.constraints)
+        self.clusters = [comp for comp in connected_components(graph)[0] if comp[0] not in self.fixed]
+        log(f"found {len(self.clusters)} cluster(s): sizes = {[len(c) for c in self.clusters]}")
+        if self.system is not None:
+            log(f"mine count bounds per cluster: "
+                f"{[mine_count_bounds(self.system, c) for c in self.clusters]}")
+
+    @classmethod
+    def from_file(cls, path, log=_quiet):
+        return cls(read_board(Path(path)), log)
+
+    def update(self, rows, log=_quiet):
+        """
+        Analyse a later version of this board (e.g. the next screenshot of
+        the same game), redoing only what the changes can reach.
+
+        A number's constraint depends only on the number and its 8
+        neighbours, so only numbers within one cell of a changed cell get
+        new constraints and only cells there can enter or leave the outline.
+        The regions (connected groups of the original constraints) holding
+        such cells are deduced and split into clusters again; every other
+        region keeps its settled cells, reduced constraints and clusters.
+
+        Returns a new Board; its `reused` maps a cluster index to the index
+        of the identical cluster of this board, so counts can be carried
+        over (see Solver.count_clusters). A board of another size is
+        analysed from scratch.
+        """
+        rows = [list(row) for row in rows]
+        if len(rows) != len(self.rows) or any(len(a) != len(b) for a, b in zip(rows, self.rows)):
+            log("board size changed, analysing from scratch")
+            return Board(rows, log)
+        nrows, ncols = len(rows), len(rows[0]) if rows else 0
+        changed = [(r, c) for r in range(nrows) for c in range(ncols) if rows[r][c] != self.rows[r][c]]
+        touched = set(changed)
+        for r, c in changed:
+            touched.update(neighbors(r, c, nrows, ncols))
+        log(f"{len(changed)} cell(s) changed since the previous board")
+
+        board = Board.__new__(Board)
+        board.rows = rows
+        board.numbers = dict(self.numbers)
+        for r, c in changed:
+            if rows[r][c].isdigit():
+                board.numbers[(r, c)] = int(rows[r][c])
+            else:
+                board.numbers.pop((r, c), None)
+        outline = set(self.outline).difference(touched)
+        outline.update((r, c) for r, c in touched if rows[r][c] in ('.', '?') and
+                       any(pos in board.numbers for pos in neighbors(r, c, nrows, ncols)))
+        board.outline = sorted(outline)
+        board.var_index = index = build_variable_index(board.outline)
+        log(f"found outline containing {len(board.outline)} cells")
+        board.system, board.reused = None, {}
+
+        # constraints of untouched numbers are unchanged up to renumbering
+        moved = [index.get(pos) for pos in self.outline]
+        prepared = {pos: {'expected': info['expected'], 'vars': [moved[v] for v in info['vars']]}
+                    for pos, info in self.prepared.items() if pos not in touched}
+        _, num_neighbors = build_constraint_graph(
+            board.outline, {pos: board.numbers[pos] for pos in touched if pos in board.numbers},
+            index, rows)
+        fresh = prepare_number_constraints(num_neighbors, rows)
+        prepared.update(fresh)
+        board.prepared = prepared
+
+        # dirty: every region reached by a new constraint, a cell near the
+        # changes or a cell an old constraint near the changes covered
+        seeds = {v for info in fresh.values() for v in info['vars']}
+        seeds.update(index[pos] for pos in touched if pos in index)
+        seeds.update(moved[v] for pos, info in self.prepared.items() if pos in touched
+                     for v in info['vars'] if moved[v] is not None)
+        graph = build_reduced_graph(len(board.outline), prepared)
+        dirty, stack = set(seeds), list(seeds)
+        while stack:
+            for v in graph[stack.pop()]:
+                if v not in dirty:
+                    dirty.add(v)
+                    stack.append(v)
+        clean = {v: moved[v] for v in range(len(self.outline))
+                 if moved[v] is not None and moved[v] not in dirty}
+
+        board.fixed = {clean[v]: sym for v, sym in self.fixed.items() if v in clean}
+        board.constraints = {pos: {'expected': info['expected'], 'vars': [clean[v] for v in info['vars']]}
+                             for pos, info in self.constraints.items()
+                             if all(v in clean for v in info['vars'])}
+        board.clusters = []
+        for idx, comp in enumerate(self.clusters):
+            if all(v in clean for v in comp):
+                board.reused[len(board.clusters)] = idx
+                board.clusters.append([clean[v] for v in comp])
+        log(f"reused {len(board.clusters)} cluster(s); re-analysing {len(dirty)} outline cell(s) "
+            f"near the changes")
+
+        dirty_constraints = {pos: info for pos, info in prepared.items() if info['vars'][0] in dirty}
+        if dirty_constraints:
+            fixed, constraints, board.system = deduce(dirty_constraints, log)
+            board.fixed.update(fixed)
+            board.constraints.update(constraints)
+            open_vars = {v for info in constraints.values() for v in info['vars']}
+            graph = build_reduced_graph(len(board.outline), constraints)
+            fresh_clusters = [comp for comp in connected_components(graph)[0] if comp[0] in open_vars]
+            log(f"found {len(fresh_clusters)} new cluster(s): sizes = {[len(c) for c in fresh_clusters]}")
+            if board.system is not None:
+                log(f"mine count bounds per new cluster: "
+                    f"{[mine_count_bounds(board.system, c) for c in fresh_clusters]}")
+            board.clusters.extend(fresh_clusters)
+        return board
+
+    def fixed_cluster(self):
+        """The settled cells as one more cluster: (var indices, its single packed solution)."""
+        comp = sorted(self.fixed)
+        return comp, sum(1 << i for i, vid in enumerate(comp) if self.fixed[vid] == 'x')
+
+
+class Solver:
+    """
+    In-process solver: read -> outline -> clusters -> solve -> combine without
+    subprocesses or intermediate files.
+
+    engine: cluster counter, one of COUNT_ENGINES. jobs: worker processes for
+    searching big clusters (see count_cluster_parallel); 1 keeps everything
+    in this process. store: optional cluster_store.ClusterStore; clusters
+    found there (under any translation or symmetry) are not solved again,
+    and newly solved ones are added. Apart from the store, the only state
+    kept between calls is the component cache, whose entries are canonical
+    sub-problems valid for any board, so one Solver can serve many boards;
+    use one Solver per thread.
+    """
+
+    def __init__(self, engine='auto', cache=None, jobs=1, store=None):
+        if engine not in COUNT_ENGINES:
+            raise ValueError(f"unknown engine {engine!r}")
+        self.engine = engine
+        self.jobs = jobs
+        self.store = store
+        self.cache = cache if cache is not None else ComponentCache()
+
+    def cluster_engine(self, comp, constraints):
+        """
+        The engine ('search', 'dp' or 'cache') to use for one cluster and the
+        cluster's frontier width (None when it was not needed): the configured
+        engine, or under 'auto' search for small clusters, the frontier DP
+        for narrow ones and the component cache for wide ones.
+        """
+        engine = self.engine
+        width = None
+        if engine == 'auto':
+            if len(comp) < DP_MIN_CLUSTER_SIZE:
+                engine = 'search'
+            else:
+                width = frontier_width(comp, constraints)
+                engine = 'dp' if width <= DP_MAX_FRONTIER_WIDTH else 'cache'
+        if engine == 'dp' and width is None:
+            width = frontier_width(comp, constraints)
+        return engine, width
+
+    def cluster_sampler(self, comp, constraints):
+        """
+        An exact sampler for one cluster (see sampling.py) from the engine
+        cluster_engine picks: the search's solution list, the frontier DP
+        tables or the component cache's counts.
+        """
+        engine, _ = self.cluster_engine(comp, constraints)
+        if engine == 'dp':
+            return FrontierSampler(comp, constraints)
+        if engine == 'cache':
+            return ComponentSampler(comp, constraints, self.cache)
+        return EnumeratedSampler(iter_cluster_solutions(comp, constraints))
+
+    def count_cluster(self, comp, constraints, progress=None):
+        """
+        Count one cluster with the configured engine; returns (counts, detail).
+        progress: see count_cluster (only the search and cache engines call it).
+        """
+        engine, width = self.cluster_engine(comp, constraints)
+        if engine == 'dp':
+            return count_cluster_dp(comp, constraints), f"frontier DP, width={width}"
+        parallel = self.jobs > 1 and len(comp) >= PARALLEL_MIN_CLUSTER_SIZE
+        if engine == 'cache':
+            stats = {}
+            if parallel:
+                counts = count_cluster_parallel(comp, constraints, self.jobs, stats, engine)
+                return counts, f"component cache, {self.jobs} processes, {format_search_stats(stats)}"
+            counts = count_cluster_cached(comp, constraints, self.cache, stats, progress)
+            return counts, f"component cache, {format_search_stats(stats | self.cache.stats())}"
+        stats = new_search_stats()
+        if parallel:
+            counts = count_cluster_parallel(comp, constraints, self.jobs, stats)
+            return counts, f"{self.jobs} processes, {format_search_stats(stats)}"
+        counts = count_cluster(comp, constraints, stats, progress=progress)
+        return counts, format_search_stats(stats)
+
+    def count_clusters(self, board, log=_quiet, previous=None, progress=None):
+        """
+        Counts for every cluster of a Board (see count_cluster), or None as
+        soon as one cluster has no solution. previous: cluster counts of the
+        board this one was updated from (Board.update); the clusters it
+        reused take their counts from there.
+
+        progress: optional callable(cluster index, done, stats), called with
+        done=False and the live search counters during long searches, and
+        with done=True once each cluster is counted (stats then holds at
+        least 'solutions'). It may raise to stop counting between or inside
+        clusters (cooperative cancellation).
+        """
+        cluster_counts = []
+        for idx, comp in enumerate(board.clusters):
+            log(f"counting cluster {idx+1}/{len(board.clusters)} (size={len(comp)})...")
+            report = None
+            if progress is not None:
+                report = lambda stats, idx=idx: progress(idx, False, stats)
+            counts = None
+            if previous is not None and idx in board.reused:
+                counts, detail = previous[board.reused[idx]], "previous board"
+            elif self.store is not None:
+                cells = [board.outline[vid] for vid in comp]
+                constraint_masks = cluster_masks(comp, board.constraints)
+                hit = self.store.get(cells, constraint_masks)
+                if hit is not None:
+                    counts, detail = hit[0], "cluster store"
+            if counts is None:
+                counts, detail = self.count_cluster(comp, board.constraints, report)
+                if self.store is not None:
+                    self.store.put(cells, constraint_masks, counts)
+            total = sum(n for n, _ in counts.values())
+            log(f"  cluster {idx+1} has {total} solutions ({detail})")
+            if progress is not None:
+                progress(idx, True, {'solutions': total})
+            if not total:
+                return None
+            cluster_counts.append(counts)
+        return cluster_counts
+
+    def probabilities(self, board, mines=None, cluster_counts=None):
+        """
+        Exact mine probability (Fraction) of every outline cell, keyed by
+        (r, c); with mines (the board's total, flags included) also of every
+        sea cell. cluster_counts: result of count_clusters, if already known.
+        Returns None when no configuration exists.
+        """
+        if cluster_counts is None:
+            cluster_counts = self.count_clusters(board)
+            if cluster_counts is None:
+                return None
+        comps = list(board.clusters)
+        cluster_counts = list(cluster_counts)
+        if board.fixed:
+            # settled cells behave like one more cluster with a single solution
+            comp, mines_mask = board.fixed_cluster()
+            comps.append(comp)
+            cluster_counts.append({mines_mask.bit_count():
+                                   [1, [mines_mask >> i & 1 for i in range(len(comp))]]})
+
+        cell_probabilities = {}
+        if mines is None:
+            for comp, counts in zip(comps, cluster_counts):
+                cell_probabilities.update((board.outline[vid], p)
+                                          for vid, p in cluster_probabilities(comp, counts).items())
+            return cell_probabilities
+
+        sea = find_sea(board.rows, board.outline)
+        mines_left = mines - sum(row.count('!') for row in board.rows)
+        combined = global_probabilities(comps, cluster_counts, len(sea), mines_left)
+        if combined is None:
+            return None
+        probabilities, sea_probability = combined
+        cell_probabilities.update((pos, sea_probability) for pos in sea)
+        cell_probabilities.update((board.outline[vid], p) for vid, p in probabilities.items())
+        return cell_probabilities
+
+    def solve(self, board, mines=None, log=_quiet):
+        """
+        Solve a Board in memory. Returns (result_board, cell_probabilities):
+        result_board is what combine_configurations.py would write ('x'/'o'
+        for certain cells, '#' for varying ones); None if no configuration.
+        """
+        cluster_counts = self.count_clusters(board, log)
+        if cluster_counts is None:
+            return None
+        cell_probabilities = self.probabilities(board, mines, cluster_counts)
+        if cell_probabilities is None:
+            return None
+        return solution_board(board.rows, cell_probabilities), cell_probabilities
+
+    def classify(self, board, log=_quiet):
+        """
+        Result board from witness searches only (see classify_cluster), or
+        None if some cluster has no solution.
+        """
+        result = [row[:] for row in board.rows]
+        for vid, sym in board.fixed.items():
+            r, c = board.outline[vid]
+            result[r][c] = sym
+        for idx, comp in enumerate(board.clusters):
+            log(f"classifying cluster {idx+1}/{len(board.clusters)} (size={len(comp)})...")
+            stats = new_search_stats()
+            values = classify_cluster(comp, board.constraints, stats)
+            if values is None:
+                return None
+            settled = sum(1 for sym in values if sym != '#')
+            log(f"  cluster {idx+1}: {settled} of {len(comp)} cell(s) settled "
+                f"({format_search_stats(stats)})")
+            for vid, sym in zip(comp, values):
+                r, c = board.outline[vid]
+                result[r][c] = sym
+        return ["".join(row) for row in result]
+
+    def cluster_solutions(self, board, comp, limit=MAX_COMBINATIONS_WARN, stats=None):
+        """
+        Every solution of one cluster of a Board as packed ints (bit i set
+        when comp[i] is a mine), from the store when it has them. limit: as
+        in iter_cluster_solutions.
+        """
+        if self.store is not None:
+            cells = [board.outline[vid] for vid in comp]
+            constraint_masks = cluster_masks(comp, board.constraints)
+            hit = self.store.get(cells, constraint_masks, solutions=True)
+            if hit is not None:
+                return hit[1]
+        if self.jobs > 1 and len(comp) >= PARALLEL_MIN_CLUSTER_SIZE:
+            masks = solve_cluster_masks_parallel(comp, board.constraints, self.jobs, stats, limit)
+        else:
+            masks = list(iter_cluster_solutions(comp, board.constraints, stats, limit=limit))
+        if self.store is not None:
+            self.store.put(cells, constraint_masks, tally_solutions(masks, len(comp)), masks)
+        return masks
+
+    def write_configurations(self, board, outpath):
+        """
+        Write every configuration of a Board as a text configurations file.
+        Returns False (writing nothing) when some cluster has no solution;
+        raises RuntimeError past MAX_COMBINATIONS_WARN.
+        """
+        comps = list(board.clusters)
+        comp_masks = [self.cluster_solutions(board, comp) for comp in comps]
+        if not all(comp_masks):
+            return False
+        if board.fixed:
+            comp, mines_mask = board.fixed_cluster()
+            comps.append(comp)
+            comp_masks.append([mines_mask])
+        comp_solutions = [[{v: 'x' if mines >> i & 1 else 'o' for i, v in enumerate(comp)} for mines in masks]
+                          for comp, masks in zip(comps, comp_masks)]
+        combine_and_write_solutions(board.rows, board.outline, board.var_index, comps, comp_solutions,
+                                    Path(outpath))
+        return True
+
+
+def save_state(board, cluster_counts, outpath):
+    """
+    Write a Board and its cluster counts (Solver.count_clusters) as JSON, so
+    the next board of the game can be solved incrementally (load_state,
+    Board.update). Cells are stored as [row, col], not var indices.
+    """
+    def constraint_list(constraints):
+        return [[r, c, info['expected'], [list(board.outline[v]) for v in info['vars']]]
+                for (r, c), info in constraints.items()]
+
+    state = {
+        'version': STATE_VERSION,
+        'rows': ["".join(row) for row in board.rows],
+        'prepared': constraint_list(board.prepared),
+        'constraints': constraint_list(board.constraints),
+        'fixed': [[*board.outline[v], sym] for v, sym in sorted(board.fixed.items())],
+        'clusters': [{'cells': [list(board.outline[v]) for v in comp], 'counts': counts}
+                     for comp, counts in zip(board.clusters, cluster_counts)],
+    }
+    with atomic_open(outpath) as f:
+        json.dump(state, f)
+
+
+def load_state(path):
+    """
+    Read a file written by save_state. Returns (board, cluster_counts) with
+    the Board rebuilt as it was analysed, without analysing it again.
+    Raises ValueError for a file of another format version.
+    """
+    with Path(path).open('r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('version') != STATE_VERSION:
+        raise ValueError(f"'{path}' is not a version {STATE_VERSION} solver state file")
+    board = Board.__new__(Board)
+    board.rows = [list(row) for row in state['rows']]
+    board.numbers = {(r, c): int(ch) for r, row in enumerate(board.rows)
+                     for c, ch in enumerate(row) if ch.isdigit()}
+    board.outline = sorted({tuple(pos) for *_, cells in state['prepared'] for pos in cells})
+    board.var_index = index = build_variable_index(board.outline)
+
+    def constraint_dict(constraints):
+        return {(r, c): {'expected': expected, 'vars': [index[tuple(pos)] for pos in cells]}
+                for r, c, expected, cells in constraints}
+
+    board.prepared = constraint_dict(state['prepared'])
+    board.constraints = constraint_dict(state['constraints'])
+    board.fixed = {index[(r, c)]: sym for r, c, sym in state['fixed']}
+    board.clusters = [[index[tuple(pos)] for pos in cluster['cells']] for cluster in state['clusters']]
+    board.system, board.reused = None, {}
+    cluster_counts = [{int(k): counts for k, counts in cluster['counts'].items()}
+                      for cluster in state['clusters']]
+    return board, cluster_counts
+
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    try:
+        iv = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if iv <= 0:
+        raise argparse.ArgumentTypeError(f"value must be > 0: {iv}")
+    return iv
+
+
+def non_negative_int(value):
+    """argparse type for counts where 0 has a meaning of its own."""
+    try:
+        iv = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if iv < 0:
+        raise argparse.ArgumentTypeError(f"value must be >= 0: {iv}")
+    return iv
+
+
+def refuse_combinations(error):
+    """CLI exit for output past MAX_COMBINATIONS_WARN, naming the modes that handle it."""
+    print(f"{error}: use --sample K to draw K of them, or --factored to write "
+          "each cluster's solutions once")
+    raise SystemExit(1)
+
+
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print("Usage: python generate_configurations.py board_YYYYMMDD_HHMMSS.txt")
-        raise SystemExit(1)
+    parser = argparse.ArgumentParser(
+        description="Generate all outline configurations of a minesweeper board.")
+    parser.add_argument("board", help="board file, e.g. board_YYYYMMDD_HHMMSS.txt")
+    parser.add_argument("--count-only", action="store_true",
+                        help="only count cluster solutions and write the solution board and "
+                             "per-cell mine probabilities directly (no configurations file)")
+    parser.add_argument("--mines", type=int, metavar="N",
+                        help="total number of mines on the board (flags included); weights "
+                             "solutions by how many ways the remaining mines fit in the cells "
+                             "away from numbers, and implies --count-only")
+    parser.add_argument("--factored", action="store_true",
+                        help="write each cluster's solutions separately instead of every "
+                             "combined board (no size limit; see combine_configurations.py)")
+    parser.add_argument("--binary", action="store_true",
+                        help="write configurations_*.bin: the board once, then one bit-packed "
+                             "record per configuration (see configurations_bin.py)")
+    parser.add_argument("--first-k", type=positive_int, metavar="K",
+                        help="stop after K solutions per cluster and write at most K "
+                             "configurations (quick look at large boards)")
+    parser.add_argument("--classify", action="store_true",
+                        help="only find which cells are certainly safe or mined, with one "
+                             "witness search per cell instead of enumeration; writes the "
+                             "solution board")
+    parser.add_argument("--sample", type=positive_int, metavar="K",
+                        help="draw K configurations exactly uniformly (weighted by --mines "
+                             "when given) and estimate mine probabilities with 95%% "
+                             "confidence intervals; no size limit")
+    parser.add_argument("--seed", type=int,
+                        help="random seed for --sample")
+    parser.add_argument("--jobs", "-j", type=non_negative_int, default=1,
+                        help=f"search clusters of {PARALLEL_MIN_CLUSTER_SIZE}+ cells on this many "
+                             "processes (0: one per core; default 1); used by the default and "
+                             "--binary enumeration and by --count-only for search and "
+                             "component-cache clusters, not by frontier-DP clusters, "
+                             "--factored, --classify, --sample or --first-k")
+    parser.add_argument("--cache", nargs="?", const=CLUSTER_STORE_PATH, metavar="PATH",
+                        help="reuse solved clusters from a persistent store shared between "
+                             f"boards (default {CLUSTER_STORE_PATH}; see cluster_store.py)")
+    parser.add_argument("--save-state", action="store_true",
+                        help="in count-only mode also write state_TIMESTAMP.json (the analysed "
+                             "board and cluster counts) for a later --previous run")
+    parser.add_argument("--previous", metavar="STATE",
+                        help="state_*.json of an earlier board of the same game: only the "
+                             "regions around changed cells are analysed and counted again; "
+                             "implies --count-only and --save-state")
+    parser.add_argument("--engine", choices=COUNT_ENGINES, default='auto',
+                        help="cluster counter for count-only and --sample: DPLL search, frontier DP, "
+                             "component-caching counter, or pick per cluster (default)")
+    args = parser.parse_args()
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
 
-    path = Path(sys.argv[1])
+    path = Path(args.board)
     print("reading board...")
     board = read_board(path)
 
-    print("finding outline and number cells...")
-    outline, numbers = find_outline_and_numbers(board)
-    print(f"found outline containing {len(outline)} cells")
+    previous = previous_counts = None
+    if args.previous:
+        args.count_only = args.save_state = True
+        print(f"reading previous state {args.previous}...")
+        try:
+            previous, previous_counts = load_state(args.previous)
+        except (OSError, ValueError) as e:
+            print("Cannot use previous state:", e)
+            raise SystemExit(2)
 
-    if not outline:
+    try:
+        parsed = previous.update(board, log=print) if previous else Board(board, log=print)
+    except ValueError as e:
+        print("Input board inconsistent:", e)
+        raise SystemExit(2)
+    if not parsed.outline:
         print("No outline cells found. Nothing to do.")
         raise SystemExit(0)
+    outline, var_index, prepared_numbers = parsed.outline, parsed.var_index, parsed.constraints
+    fixed, comps = parsed.fixed, list(parsed.clusters)
+    store = ClusterStore(args.cache) if args.cache else None
+    solver = Solver(args.engine, jobs=args.jobs, store=store)
 
-    var_index = build_variable_index(outline)
-    print("building constraint graph...")
-    graph, num_neighbors = build_constraint_graph(outline, numbers, var_index)
+    timestamp = "_".join(path.stem.split("_")[1:]) if "_" in path.stem else datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    print("computing connected components of the outline (clusters)...")
-    comps, comp_id = connected_components(graph)
-    print(f"found {len(comps)} cluster(s): sizes = {[len(c) for c in comps]}")
+    if args.classify:
+        result_board = solver.classify(parsed, log=print)
+        if result_board is None:
+            print("No valid solutions for a cluster -> overall board has no valid configurations")
+            raise SystemExit(0)
+        searched = sum(1 for vid, (r, c) in enumerate(outline)
+                       if vid not in fixed and result_board[r][c] != '#')
+        print(f"settled {searched} outline cell(s) by witness search")
+        save_solution_board(result_board, Path(f"solution_{timestamp}.txt"))
+        raise SystemExit(0)
 
-    # prepare numeric constraints (expected counts after accounting for flagged '!')
-    try:
-        prepared_numbers = prepare_number_constraints(num_neighbors, board)
-    except ValueError as e:
-        print("Input board inconsistent:", e)
-        raise SystemExit(2)
+    if args.sample is not None:
+        # per cluster: solution counts by mine total plus an exact sampler
+        # built by the same engine --engine picks for counting
+        samplers = []
+        for idx, comp in enumerate(comps):
+            print(f"preparing sampler for cluster {idx+1}/{len(comps)} (size={len(comp)})...")
+            sampler = solver.cluster_sampler(comp, prepared_numbers)
+            total = sum(sampler.counts.values())
+            print(f"  cluster {idx+1} has {total} solutions")
+            if not total:
+                print("No valid solutions for a cluster -> overall board has no valid configurations")
+                raise SystemExit(0)
+            samplers.append(sampler)
+        if fixed:
+            # propagated cells behave like one more cluster with a single solution
+            fixed_comp, fixed_mask = parsed.fixed_cluster()
+            comps.append(fixed_comp)
+            samplers.append(EnumeratedSampler([fixed_mask]))
 
-    # solve each cluster independently
-    comp_solutions = []
-    for idx, comp in enumerate(comps):
-        print(f"solving cluster {idx+1}/{len(comps)} (size={len(comp)})...")
-        # map var idx -> pos for convenience
-        var_pos_map = {v: outline[v] for v in comp}
-        sols = solve_cluster(comp, var_pos_map, prepared_numbers)
-        print(f"  cluster {idx+1} has {len(sols)} solutions")
-        if not sols:
+        sea = []
+        mines_left = None
+        if args.mines is not None:
+            sea = find_sea(board, outline)
+            flagged = sum(row.count('!') for row in board)
+            mines_left = args.mines - flagged
+            print(f"{mines_left} mine(s) left for {len(outline)} outline and {len(sea)} sea cell(s)")
+        try:
+            sampler = ConfigurationSampler(samplers, len(sea), mines_left)
+        except ValueError:
+            print(f"No configuration places exactly {args.mines} mines on the board")
+            raise SystemExit(0)
+        print(f"{sampler.total()} configurations in total; drawing {args.sample}")
+
+        statistics = SampleStatistics([len(comp) for comp in comps])
+        draws = draw_configurations(sampler, args.sample, random.Random(args.seed), statistics)
+        outname = Path(f"configurations_{timestamp}.txt")
+        print(f"Writing {args.sample} sampled configurations to {outname} ...")
+        write_sampled_configurations(board, outline, comps, draws, outname)
+        print("Done.")
+
+        cell_probabilities = {}
+        intervals = {}
+        for comp, estimates in zip(comps, statistics.cell_estimates()):
+            for vid, (p, lo, hi) in zip(comp, estimates):
+                cell_probabilities[outline[vid]] = p
+                intervals[outline[vid]] = (lo, hi)
+        if sea:
+            p, lo, hi = statistics.sea_estimate()
+            print(f"sea cells: {100 * p:.1f}% mine probability each [{100 * lo:.1f}%, {100 * hi:.1f}%]")
+            for pos in sea:
+                cell_probabilities[pos] = p
+                intervals[pos] = (lo, hi)
+        probname = Path(f"probabilities_{timestamp}.txt")
+        ranked = write_probabilities(cell_probabilities, probname, intervals)
+        print(f"Estimated mine probabilities (95% intervals) saved to '{probname}'")
+        print("Safest cells (row, col): mine % [95% interval]")
+        for pos in ranked[:5]:
+            lo, hi = intervals[pos]
+            print(f"  {pos}: {100 * cell_probabilities[pos]:.1f}% [{100 * lo:.1f}%, {100 * hi:.1f}%]")
+        raise SystemExit(0)
+
+    if args.count_only or args.mines is not None:
+        cluster_counts = solver.count_clusters(parsed, log=print, previous=previous_counts)
+        if cluster_counts is None:
             print("No valid solutions for a cluster -> overall board has no valid configurations")
             raise SystemExit(0)
-        comp_solutions.append(sols)
+        if args.save_state:
+            statename = Path(f"state_{timestamp}.json")
+            save_state(parsed, cluster_counts, statename)
+            print(f"Solver state saved to '{statename}'")
+        searched = sum(1 for comp, counts in zip(comps, cluster_counts)
+                       for p in cluster_probabilities(comp, counts).values() if p in (0, 1))
+        print(f"settled {searched} outline cell(s) by search")
 
-    # output file name
-    timestamp = "_".join(path.stem.split("_")[1:]) if "_" in path.stem else datetime.now().strftime("%Y%m%d_%H%M%S")
+        if args.mines is not None:
+            sea = find_sea(board, outline)
+            flagged = sum(row.count('!') for row in board)
+            print(f"{args.mines - flagged} mine(s) left for {len(outline)} outline "
+                  f"and {len(sea)} sea cell(s)")
+        cell_probabilities = solver.probabilities(parsed, args.mines, cluster_counts)
+        if cell_probabilities is None:
+            print(f"No configuration places exactly {args.mines} mines on the board")
+            raise SystemExit(0)
+        if args.mines is not None and sea:
+            print(f"sea cells: {100 * float(cell_probabilities[sea[0]]):.1f}% mine probability each")
+
+        save_solution_board(solution_board(board, cell_probabilities),
+                            Path(f"solution_{timestamp}.txt"))
+
+        probname = Path(f"probabilities_{timestamp}.txt")
+        ranked = write_probabilities(cell_probabilities, probname)
+        print(f"Mine probabilities saved to '{probname}'")
+        print("Safest cells (row, col): mine %")
+        for pos in ranked[:5]:
+            print(f"  {pos}: {100 * float(cell_probabilities[pos]):.1f}%")
+        raise SystemExit(0)
+
+    # solve each cluster independently, in the cheapest mode that answers the
+    # question: factored output streams every cluster straight to disk,
+    # --first-k stops each cluster after k solutions, and the flat formats stop
+    # as soon as one cluster alone exceeds MAX_COMBINATIONS_WARN
     outname = Path(f"configurations_{timestamp}.txt")
+    fixed_comp, fixed_mask = parsed.fixed_cluster()
+
+    if args.factored:
+        all_stats = [new_search_stats() for _ in comps]
+        lazy = [iter_cluster_solutions(comp, prepared_numbers, stats, first_k=args.first_k)
+                for comp, stats in zip(comps, all_stats)]
+        if fixed:
+            # propagated cells behave like one more cluster with a single solution
+            counts = write_factored_solutions(board, outline, comps + [fixed_comp],
+                                              lazy + [[fixed_mask]], outname)
+        else:
+            counts = write_factored_solutions(board, outline, comps, lazy, outname)
+        for idx, (n, stats) in enumerate(zip(counts, all_stats)):
+            print(f"  cluster {idx+1} has {n} solutions ({format_search_stats(stats)})")
+        if 0 in counts:
+            outname.unlink()
+            print("No valid solutions for a cluster -> overall board has no valid configurations")
+        raise SystemExit(0)
+
+    comp_masks = []
+    searched = 0
+    for idx, comp in enumerate(comps):
+        print(f"solving cluster {idx+1}/{len(comps)} (size={len(comp)})...")
+        stats = new_search_stats()
+        if args.first_k is not None:
+            masks = list(iter_cluster_solutions(comp, prepared_numbers, stats, first_k=args.first_k))
+        else:
+            try:
+                masks = solver.cluster_solutions(parsed, comp, stats=stats)
+            except RuntimeError as e:
+                refuse_combinations(e)
+        print(f"  cluster {idx+1} has {len(masks)} solutions ({format_search_stats(stats)})")
+        if not masks:
+            print("No valid solutions for a cluster -> overall board has no valid configurations")
+            raise SystemExit(0)
+        always, ever = -1, 0
+        for mines in masks:
+            always &= mines
+            ever |= mines
+        searched += len(comp) - (ever & ~always).bit_count()
+        comp_masks.append(masks)
+    if args.first_k is None:
+        print(f"settled {searched} outline cell(s) by search")
 
-    combine_and_write_solutions(board, outline, var_index, comps, comp_solutions, outname)
+    if fixed:
+        # propagated cells behave like one more cluster with a single solution
+        comps.append(fixed_comp)
+        comp_masks.append([fixed_mask])
 
+    if args.binary:
+        outname = outname.with_suffix(".bin")
+        cells = [outline[v] for comp in comps for v in comp]
+        shifted_masks = []
+        offset = 0
+        for comp, masks in zip(comps, comp_masks):
+            shifted_masks.append([mines << offset for mines in masks])
+            offset += len(comp)
+        total = 1
+        for masks in shifted_masks:
+            total *= len(masks)
+        if args.first_k is not None:
+            total = min(total, args.first_k)
+        if total > MAX_COMBINATIONS_WARN:
+            refuse_combinations(f"Refusing to produce >{MAX_COMBINATIONS_WARN} combined solutions ({total})")
+        print(f"Writing {total} combined solutions to {outname} ...")
+        try:
+            write_binary_configurations(board, cells, shifted_masks, outname, args.first_k)
+        except ValueError as e:
+            print("Cannot write --binary output:", e)
+            raise SystemExit(2)
+        print("Done.")
+    else:
+        comp_solutions = [[{v: 'x' if mines >> i & 1 else 'o' for i, v in enumerate(comp)} for mines in masks]
+                          for comp, masks in zip(comps, comp_masks)]
+        try:
+            combine_and_write_solutions(board, outline, var_index, comps, comp_solutions, outname,
+                                        args.first_k)
+        except RuntimeError as e:
+            refuse_combinations(e)
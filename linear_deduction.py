@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+linear_deduction.py
+
+Gaussian-elimination deductions over the outline constraint matrix.
+
+Every number constraint is a linear equation over 0/1 variables:
+    sum(x_v for v in vars) = expected
+Stacking them gives A x = b for the whole outline, which is block-diagonal
+over groups of constraints sharing variables; each block is row-reduced on
+its own. Row-reducing the augmented matrix (fraction-free, with exact Python ints inside NumPy object
+arrays) produces combinations of constraints that local rules never look at.
+
+For any equation sum(a_j x_j) = b with 0/1 variables, the left side lies
+between the sum of the negative and the sum of the positive coefficients.
+A variable is forced when one of its two values would push that range past b:
+    a > 0:  x = 1 if pos - a < b,  x = 0 if neg + a > b
+    a < 0:  x = 1 if neg - a > b,  x = 0 if pos + a < b
+The check runs vectorized over the original and the reduced rows; forced
+values are substituted and the matrix is reduced again until nothing new is
+found.
+
+The reduced system also bounds how many mines each cluster can hold: the
+pivot variables are affine functions of the free ones, so a cluster's mine
+total is an affine function of its free variables whose range is read off
+its coefficients.
+
+Requires NumPy.
+"""
+
+from fractions import Fraction
+from math import ceil, floor
+
+import numpy as np
+
+
+def constraint_blocks(number_constraints):
+    """
+    Split {pos: {'expected', 'vars'}} constraints into groups that share no
+    variable. The constraint matrix is block-diagonal over these groups, so
+    each can be reduced on its own. Returns a list of (vars, constraints)
+    with vars the sorted var indices of the group.
+    """
+    parent = {}
+
+    def find(v):
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    for info in number_constraints.values():
+        vs = info['vars']
+        for v in vs:
+            parent.setdefault(v, v)
+        root = find(vs[0]) if vs else None
+        for v in vs[1:]:
+            parent[find(v)] = root
+    blocks = {}
+    for pos, info in number_constraints.items():
+        key = find(info['vars'][0]) if info['vars'] else None
+        blocks.setdefault(key, {})[pos] = info
+    result = []
+    for key, constraints in blocks.items():
+        cols = sorted({v for info in constraints.values() for v in info['vars']})
+        result.append((cols, constraints))
+    return result
+
+
+def constraint_matrix(cols, number_constraints):
+    """
+    Build (A, b) as object arrays from {pos: {'expected', 'vars'}} constraints;
+    column j of A is var index cols[j].
+    """
+    column = {v: j for j, v in enumerate(cols)}
+    rows = list(number_constraints.values())
+    A = np.zeros((len(rows), len(cols)), dtype=object)
+    b = np.zeros(len(rows), dtype=object)
+    for r, info in enumerate(rows):
+        A[r, [column[v] for v in info['vars']]] = 1
+        b[r] = info['expected']
+    return A, b
+
+
+def row_reduce(A, b):
+    """
+    Fraction-free Gauss-Jordan elimination of [A | b].
+
+    Returns (R, pivots): R holds the non-zero reduced rows of the augmented
+    matrix (last column is the right-hand side), each divided by the gcd of its
+    entries and with a positive pivot; pivots[i] is the pivot column of row i.
+    """
+    M = np.concatenate([A, b[:, None]], axis=1).astype(object)
+    nrows, ncols = A.shape
+    pivots = []
+    r = 0
+    for col in range(ncols):
+        if r == nrows:
+            break
+        candidates = np.nonzero(M[r:, col] != 0)[0]
+        if not len(candidates):
+            continue
+        p = r + candidates[0]
+        if p != r:
+            M[[r, p]] = M[[p, r]]
+        if M[r, col] < 0:
+            M[r] = -M[r]
+        others = np.nonzero(M[:, col] != 0)[0]
+        others = others[others != r]
+        if len(others):
+            M[others] = M[others] * M[r, col] - np.outer(M[others, col], M[r])
+            g = np.gcd.reduce(M[others], axis=1)
+            g[g == 0] = 1
+            M[others] = M[others] // g[:, None]
+        pivots.append(col)
+        r += 1
+    return M[:r], pivots
+
+
+def forced_values(A, b):
+    """
+    Apply the coefficient-range rule to every row of A x = b.
+
+    Returns (ones, zeros): boolean column masks of variables forced to 1 and 0.
+    Raises ValueError when some row cannot be satisfied.
+    """
+    if not len(A):
+        empty = np.zeros(A.shape[1], dtype=bool)
+        return empty, empty
+    pos = np.where(A > 0, A, 0).sum(axis=1)
+    neg = np.where(A < 0, A, 0).sum(axis=1)
+    if np.any(b > pos) or np.any(b < neg):
+        raise ValueError("Inconsistent board: constraint equations have no 0/1 solution")
+    pos, neg, rhs = pos[:, None], neg[:, None], b[:, None]
+    positive, negative = A > 0, A < 0
+    ones = (positive & (pos - A < rhs)) | (negative & (neg - A > rhs))
+    zeros = (positive & (neg + A > rhs)) | (negative & (pos + A < rhs))
+    ones, zeros = ones.any(axis=0), zeros.any(axis=0)
+    if np.any(ones & zeros):
+        raise ValueError("Inconsistent board: a cell is forced to be both safe and a mine")
+    return ones, zeros
+
+
+def gauss_deductions(number_constraints, fixed=None):
+    """
+    Find cells forced by linear combinations of the constraints.
+
+    fixed: optional var index -> 'x'/'o' of cells already settled (e.g. by
+    propagation); they are substituted before elimination.
+
+    The constraints are reduced one block of constraint_blocks at a time,
+    which gives the same deductions as the whole matrix at a fraction of the
+    cost: elimination is cubic in the size of what it reduces.
+
+    Returns (forced, system) where forced maps var index -> 'x' or 'o' for the
+    newly settled cells only, and system is a list of (cols, R, pivots), one
+    per block: the final reduced matrix over the block's variables (see
+    row_reduce), column j standing for var index cols[j].
+    Raises ValueError on contradictory constraints.
+    """
+    fixed = fixed or {}
+    forced, system = {}, []
+    for cols, constraints in constraint_blocks(number_constraints):
+        block_fixed = {j: fixed[v] for j, v in enumerate(cols) if v in fixed}
+        block_forced, (R, pivots) = _reduce_block(*constraint_matrix(cols, constraints), block_fixed)
+        forced.update((cols[j], sym) for j, sym in block_forced.items())
+        system.append((cols, R, pivots))
+    return forced, system
+
+
+def _reduce_block(A, b, fixed):
+    """gauss_deductions on one block; var indices are column numbers of A."""
+    known = dict(fixed)
+    forced = {}
+    while True:
+        cols = list(known)
+        if cols:
+            values = np.array([1 if known[v] == 'x' else 0 for v in cols], dtype=object)
+            b_sub = b - A[:, cols].dot(values)
+            A_sub = A.copy()
+            A_sub[:, cols] = 0
+        else:
+            A_sub, b_sub = A, b
+        R, pivots = row_reduce(A_sub, b_sub)
+        ones, zeros = forced_values(np.concatenate([A_sub, R[:, :-1]]),
+                                    np.concatenate([b_sub, R[:, -1]]))
+        new = [(v, 'x') for v in np.nonzero(ones)[0] if v not in known]
+        new += [(v, 'o') for v in np.nonzero(zeros)[0] if v not in known]
+        if not new:
+            return forced, (R, pivots)
+        for v, sym in new:
+            known[int(v)] = forced[int(v)] = sym
+
+
+def mine_count_bounds(system, cluster_vars):
+    """
+    Lower and upper bound on the number of mines in a cluster.
+
+    Each pivot variable equals (rhs - sum(a_f x_f)) / a_p over the free
+    variables f of its row, so the cluster total is an affine function of the
+    cluster's free variables; its minimum and maximum over 0/1 values are
+    rounded inwards and clamped to [0, len(cluster_vars)].
+    """
+    in_cluster = set(cluster_vars)
+    pivot_set = {cols[p] for cols, _, pivots in system for p in pivots}
+    constant = Fraction(0)
+    coeffs = {v: Fraction(1) for v in cluster_vars if v not in pivot_set}
+    for cols, R, pivots in system:
+        for row, p in zip(R, pivots):
+            if cols[p] not in in_cluster:
+                continue
+            constant += Fraction(row[-1], row[p])
+            for f in np.nonzero(row[:-1] != 0)[0]:
+                if f != p:
+                    coeffs[cols[f]] = coeffs.get(cols[f], 0) - Fraction(row[f], row[p])
+    lo = constant + sum(c for c in coeffs.values() if c < 0)
+    hi = constant + sum(c for c in coeffs.values() if c > 0)
+    return max(0, ceil(lo)), min(len(cluster_vars), floor(hi))
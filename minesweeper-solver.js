@@ -1821,6 +1821,7 @@ function resetOCRState() {
 
 function initSolver() {
   document.getElementById('loadFromEditor').addEventListener('click', () => {
+    cancelServerJob();
     const boardStr = boardToString(state.editor.board);
     state.solver.inputBoard = boardStr;
     document.getElementById('inputBoard').value = boardStr;
@@ -1830,6 +1831,8 @@ function initSolver() {
   document.getElementById('solveBoard').addEventListener('click', solveBoard);
   document.getElementById('viewSolution').addEventListener('click', viewSolution);
   document.getElementById('saveToHistory').addEventListener('click', saveToHistory);
+  // Editing the board makes a running server solve pointless
+  document.getElementById('inputBoard').addEventListener('input', cancelServerJob);
 }
 
 function loadBoardFile() {
@@ -1842,6 +1845,7 @@ function loadBoardFile() {
       const reader = new FileReader();
       reader.onload = (e) => {
         const content = e.target.result;
+        cancelServerJob();
         state.solver.inputBoard = content;
         document.getElementById('inputBoard').value = content;
       };
@@ -1860,15 +1864,16 @@ function solveBoard() {
   }
 
   // Show progress
+  showSolverProgress('Analyzing configurations...');
   document.getElementById('solverProgress').classList.remove('hidden');
   document.getElementById('solverStats').classList.add('hidden');
   document.getElementById('solverResult').classList.add('hidden');
 
   // Use setTimeout to allow UI to update
-  setTimeout(() => {
+  setTimeout(async () => {
     try {
       const board = stringToBoard(inputStr);
-      const result = solveMinesweeper(board);
+      const result = (await solveOnServer(board)) || solveMinesweeper(board);
 
       state.solver.outputBoard = boardToString(result.solution);
       state.solver.stats = result.stats;
@@ -1935,6 +1940,7 @@ function solveBoard() {
 
     } catch (error) {
       document.getElementById('solverProgress').classList.add('hidden');
+      if (error instanceof SolveCancelled) return; // the board changed under it
       showErrorToast('Error solving board: ' + error.message, 5000);
     }
   }, 100);
@@ -2070,6 +2076,174 @@ function saveToHistory() {
   showSuccessToast('Game saved to history!');
 }
 
+// ============================================================================
+// SERVER SOLVER (serve.py /api/jobs, /api/solve)
+// ============================================================================
+
+// The server job being followed: { id, events, reject }
+let serverJob = null;
+
+// Raised when the user edits the board while a server job is running
+class SolveCancelled extends Error {}
+
+// POST a board to one of serve.py's endpoints; null when it is not there
+async function postBoard(url, board) {
+  let response;
+  try {
+    response = await fetch(url, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ board: boardToString(board) })
+    });
+  } catch (error) {
+    return null;
+  }
+  if (response.status === 404 || response.status === 405 || response.status === 501) {
+    return null;
+  }
+  const data = await response.json();
+  if (!response.ok) {
+    throw new Error(data.error || `server returned ${response.status}`);
+  }
+  return data;
+}
+
+function showSolverProgress(text) {
+  document.getElementById('solverProgressText').textContent = text;
+}
+
+// Run the board as a server job, following its progress events until the
+// result arrives. Null when the server has no job API (or its queue is full).
+async function runServerJob(board) {
+  let job;
+  try {
+    job = await postBoard('/api/jobs', board);
+  } catch (error) {
+    return null; // e.g. 503 too many jobs: try /api/solve instead
+  }
+  if (!job) return null;
+
+  return new Promise((resolve, reject) => {
+    const events = new EventSource(job.events);
+    serverJob = { id: job.id, events, reject };
+    const finish = () => {
+      events.close();
+      serverJob = null;
+    };
+
+    events.addEventListener('analysing', (e) => {
+      showSolverProgress(`Analysing the board: ${JSON.parse(e.data).message}`);
+    });
+    events.addEventListener('analysed', (e) => {
+      const data = JSON.parse(e.data);
+      showSolverProgress(`Solving ${data.clusters} cluster(s) over ${data.outline} outline cells...`);
+    });
+    events.addEventListener('progress', (e) => {
+      const data = JSON.parse(e.data);
+      let text = `Cluster ${data.clusters_done + 1} of ${data.clusters}: ` +
+        `${data.nodes.toLocaleString()} nodes explored`;
+      if (data.solutions !== undefined) { // the cached counter only knows at the end
+        text += `, ${data.solutions.toLocaleString()} solutions so far`;
+      }
+      showSolverProgress(text);
+    });
+    events.addEventListener('cluster', (e) => {
+      const data = JSON.parse(e.data);
+      showSolverProgress(`${data.clusters_done} of ${data.clusters} cluster(s) solved`);
+    });
+    events.addEventListener('done', (e) => {
+      finish();
+      resolve(JSON.parse(e.data).result);
+    });
+    events.addEventListener('cancelled', () => {
+      finish();
+      reject(new SolveCancelled('the solve was cancelled'));
+    });
+    events.addEventListener('timeout', (e) => {
+      finish();
+      reject(new Error(JSON.parse(e.data).result.error));
+    });
+    events.addEventListener('error', (e) => {
+      if (e.data) { // the job failed; otherwise the connection dropped
+        finish();
+        reject(new Error(JSON.parse(e.data).result.error));
+      } else if (events.readyState === EventSource.CLOSED) {
+        finish();
+        reject(new Error('lost the connection to the server'));
+      } // else EventSource reconnects and resumes after the last event id
+    });
+  });
+}
+
+// Stop the running server job (the board it solves has been edited)
+function cancelServerJob() {
+  if (!serverJob) return;
+  const { id, events, reject } = serverJob;
+  serverJob = null;
+  events.close();
+  fetch(`/api/jobs/${id}`, { method: 'DELETE' }).catch(() => {});
+  reject(new SolveCancelled('the board was edited'));
+}
+
+// Solve with the Python cluster solver behind serve.py: exact probabilities
+// for any board size, computed off this tab, with live progress for long
+// solves. Returns null when no solve API is reachable (file://, plain static
+// server), so the caller can fall back to the in-browser solveMinesweeper;
+// throws when the server rejects the board or the solve is cancelled.
+async function solveOnServer(board) {
+  if (location.protocol === 'file:') return null;
+
+  cancelServerJob();
+  const data = (await runServerJob(board)) || (await postBoard('/api/solve', board));
+  if (!data) return null;
+  if (data.status === 'error') {
+    throw new Error(data.error);
+  }
+  if (data.status === 'no-solution') {
+    throw new Error('the board has no valid configuration');
+  }
+
+  const solution = data.solution.map(row => row.split(''));
+  let safeCells = 0;
+  let mineCells = 0;
+  let uncertainCells = 0;
+  for (const row of solution) {
+    for (const ch of row) {
+      if (ch === 'o') safeCells++;
+      if (ch === 'x') mineCells++;
+      if (ch === '#') uncertainCells++;
+    }
+  }
+
+  // Same shape as solveMinesweeper: probabilities only when a guess is needed
+  let probabilities = null;
+  let bestCell = null;
+  if (safeCells === 0 && uncertainCells > 0 && data.best_guess) {
+    probabilities = {};
+    for (const { cell, mine_probability } of data.probabilities) {
+      if (mine_probability > 0 && mine_probability < 1) {
+        probabilities[`${cell[0]},${cell[1]}`] = mine_probability;
+      }
+    }
+    const [r, c] = data.best_guess.cell;
+    bestCell = { position: `${r},${c}`, probability: data.best_guess.mine_probability };
+  }
+
+  return {
+    solution,
+    stats: {
+      outlineSize: data.outline,
+      clusters: data.clusters,
+      configurations: data.configurations,
+      safeCells,
+      mineCells,
+      uncertainCells
+    },
+    probabilities,
+    bestCell
+  };
+}
+
 // ============================================================================
 // MINESWEEPER SOLVER ALGORITHM
 // ============================================================================
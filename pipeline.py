@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
+import argparse
 import sys
-import subprocess
+import time
 from pathlib import Path
 
+from board_watcher import BoardWatcher
+from cluster_store import DEFAULT_PATH as CLUSTER_STORE_PATH, ClusterStore
+from generate_configurations import (Board, Solver, read_board, save_solution_board,
+                                     solution_board, write_probabilities)
+
 def find_latest_board():
     """Find the most recent board_*.txt file based on the timestamp in its name."""
     board_files = sorted(Path(".").glob("board_*.txt"))
@@ -11,72 +17,159 @@ def find_latest_board():
         sys.exit(1)
     return board_files[-1]  # The latest one lexicographically
 
+def board_timestamp(board_path):
+    """TIMESTAMP of board_TIMESTAMP.txt (the whole stem, with a warning, otherwise)."""
+    board_name = board_path.stem  # e.g., board_20251022_140233
+    if board_name.startswith("board_"):
+        return board_name[6:]
+    print(f"Warning: Expected filename format 'board_TIMESTAMP.txt', got '{board_path}'")
+    return board_name
+
+def print_safest(probabilities):
+    open_cells = sorted((p, pos) for pos, p in probabilities.items() if 0 < p < 1)
+    if open_cells:
+        print("Safest undecided cells (row, col): mine %")
+        for p, pos in open_cells[:5]:
+            print(f"  {pos}: {100 * float(p):.1f}%")
+
+def watch(directory, solver, mines=None, poll=None):
+    """
+    Daemon mode: solve every board_*.txt that appears in directory, until
+    Ctrl-C, writing solution_TIMESTAMP.txt and probabilities_TIMESTAMP.txt
+    next to it (atomically, see generate_configurations.atomic_open).
+
+    Everything stays warm between boards: modules are imported once, the
+    Solver keeps its component cache and store connection, and the last
+    board with its cluster counts is kept, so the next screenshot of the
+    game only re-analyses and re-counts the regions around changed cells
+    (Board.update). A board that cannot be read or solved is reported and
+    skipped; after a solver error the next board is analysed from scratch.
+    """
+    previous = previous_counts = None
+    with BoardWatcher(directory, poll) as watcher:
+        latest = watcher.latest()
+        print(f"Watching {directory} for new board_*.txt files ({watcher.mode}); Ctrl-C to stop")
+        pending = [latest] if latest is not None else []
+        while True:
+            for board_path in pending:
+                start = time.perf_counter()
+                print("\n" + "=" * 60)
+                print(f"New board: {board_path}")
+                try:
+                    rows = read_board(board_path)
+                    board = previous.update(rows) if previous is not None else Board(rows)
+                except (OSError, ValueError) as e:
+                    print(f"Skipped: {e}")
+                    continue
+                try:
+                    cluster_counts = solver.count_clusters(board, previous=previous_counts)
+                    probabilities = None
+                    if cluster_counts is not None:
+                        probabilities = solver.probabilities(board, mines, cluster_counts)
+                    if probabilities is None:
+                        print("Error: the board has no valid configuration")
+                        continue
+                    previous, previous_counts = board, cluster_counts
+                    timestamp = board_timestamp(board_path)
+                    save_solution_board(solution_board(board.rows, probabilities),
+                                        board_path.with_name(f"solution_{timestamp}.txt"))
+                    write_probabilities(probabilities,
+                                        board_path.with_name(f"probabilities_{timestamp}.txt"))
+                except Exception as e:  # one failing board must not stop the daemon
+                    print(f"Skipped: {type(e).__name__}: {e}")
+                    # start the next board from scratch rather than from a
+                    # state this failure may have left half-updated
+                    previous = previous_counts = None
+                    continue
+                print_safest(probabilities)
+                print(f"Solved in {1000 * (time.perf_counter() - start):.1f} ms "
+                      f"({len(board.reused)} of {len(board.clusters)} cluster(s) reused)")
+            pending = watcher.wait()
+
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python3 pipeline.py <board_filename | -l | --latest>")
-        print("Example: python3 pipeline.py board_20251013_133207.txt")
-        print("         python3 pipeline.py --latest")
-        sys.exit(1)
-    
-    arg = sys.argv[1]
+    parser = argparse.ArgumentParser(
+        description="Solve a board in one process: read, split into clusters, solve and "
+                    "combine in memory, then write solution_TIMESTAMP.txt.",
+        epilog="Example: python3 pipeline.py board_20251013_133207.txt\n"
+               "         python3 pipeline.py --latest\n"
+               "         python3 pipeline.py --watch screenshots/",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("board", nargs="?", help="board file, e.g. board_YYYYMMDD_HHMMSS.txt")
+    parser.add_argument("-l", "--latest", action="store_true",
+                        help="use the most recent board_*.txt in the current directory")
+    parser.add_argument("--mines", type=int, metavar="N",
+                        help="total number of mines on the board (flags included)")
+    parser.add_argument("--configurations", action="store_true",
+                        help="also write configurations_TIMESTAMP.txt (every configuration)")
+    parser.add_argument("--cache", nargs="?", const=str(CLUSTER_STORE_PATH), metavar="PATH",
+                        help="reuse solved clusters from a persistent store, so clusters seen "
+                             "on an earlier board are not solved again (default "
+                             f"{CLUSTER_STORE_PATH}; see cluster_store.py)")
+    parser.add_argument("--watch", nargs="?", const=".", metavar="DIR",
+                        help="keep running and solve each new board_*.txt in DIR (default: "
+                             "the current directory) with warm caches, starting with the latest")
+    parser.add_argument("--poll", type=float, metavar="SECONDS",
+                        help="with --watch, poll the directory at this interval instead of "
+                             "using inotify")
+    args = parser.parse_args()
+
+    if args.watch:
+        store = ClusterStore(args.cache) if args.cache else None
+        try:
+            watch(Path(args.watch), Solver(store=store), args.mines, args.poll)
+        except KeyboardInterrupt:
+            print("\nStopped watching.")
+        return
 
-    if arg in ("-l", "--latest"):
+    if args.latest:
         board_path = find_latest_board()
         board_file = str(board_path)
         print(f"Using latest board file: {board_file}")
-    else:
-        board_file = arg
+    elif args.board:
+        board_file = args.board
         board_path = Path(board_file)
         if not board_path.exists():
             print(f"Error: File '{board_file}' not found.")
             sys.exit(1)
-    
-    # Extract timestamp
-    board_name = board_path.stem  # e.g., board_20251022_140233
-    if board_name.startswith("board_"):
-        timestamp = board_name[6:]
     else:
-        print(f"Warning: Expected filename format 'board_TIMESTAMP.txt', got '{board_file}'")
-        timestamp = board_name
-    
-    configurations_file = f"configurations_{timestamp}.txt"
-    
-    print(f"Step 1: Generating configurations from {board_file}")
-    print(f"Running: python3 generate_configurations.py {board_file}")
-    print("-" * 60)
-    
-    try:
-        subprocess.run(
-            ["python3", "generate_configurations.py", board_file],
-            check=True
-        )
-    except subprocess.CalledProcessError as e:
-        print(f"\nError: generate_configurations.py failed with exit code {e.returncode}")
-        sys.exit(1)
-    except FileNotFoundError:
-        print("\nError: python3 or generate_configurations.py not found")
+        parser.print_usage()
         sys.exit(1)
-    
-    print(f"\nStep 2: Combining configurations from {configurations_file}")
-    print(f"Running: python3 combine_configurations.py {configurations_file}")
+
+    timestamp = board_timestamp(board_path)
+
+    print(f"Step 1: Analysing {board_file}")
     print("-" * 60)
-    
     try:
-        subprocess.run(
-            ["python3", "combine_configurations.py", configurations_file],
-            check=True
-        )
-    except subprocess.CalledProcessError as e:
-        print(f"\nError: combine_configurations.py failed with exit code {e.returncode}")
+        board = Board(read_board(board_path), log=print)
+    except ValueError as e:
+        print(f"\nError: input board inconsistent: {e}")
         sys.exit(1)
-    except FileNotFoundError:
-        print("\nError: python3 or combine_configurations.py not found")
+    store = ClusterStore(args.cache) if args.cache else None
+    solver = Solver(store=store)
+
+    if args.configurations:
+        configurations_file = f"configurations_{timestamp}.txt"
+        print(f"\nWriting configurations to {configurations_file}")
+        print("-" * 60)
+        try:
+            solver.write_configurations(board, configurations_file)
+        except RuntimeError as e:
+            print(f"\nError: {e}")
+            sys.exit(1)
+
+    print("\nStep 2: Solving and combining clusters")
+    print("-" * 60)
+    solved = solver.solve(board, args.mines, log=print)
+    if solved is None:
+        print("\nError: the board has no valid configuration")
         sys.exit(1)
-    
+    result_board, probabilities = solved
+    save_solution_board(result_board, Path(f"solution_{timestamp}.txt"))
+    print_safest(probabilities)
+
     print("\n" + "=" * 60)
     print("Pipeline completed successfully!")
     print("=" * 60)
 
 if __name__ == "__main__":
     main()
-
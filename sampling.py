@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+sampling.py
+
+Exact uniform sampling of whole-board configurations from per-cluster counts.
+
+When the product of the cluster solution counts is too large to write out,
+configurations can still be drawn one at a time without enumerating or
+rejecting anything:
+
+1. The total number of outline mines t is drawn with weight
+   (configurations with t outline mines) * (ways to place the remaining mines
+   in the sea), the second factor only when the total mine count is known.
+2. The clusters then split t between them one after another: cluster i gets
+   k mines with weight n_i(k) * (ways the later clusters hold t - k), read off
+   suffix products of the {mines: count} polynomials.
+3. Each cluster draws one of its solutions with exactly k mines uniformly
+   (FrontierSampler for long clusters, component_cache.ComponentSampler for
+   clusters too wide for the frontier DP, EnumeratedSampler for small ones).
+
+All weights are exact Python ints, so every configuration is drawn with
+exactly its share of the (possibly mine-count weighted) total.
+
+SampleStatistics turns the draws into Monte-Carlo mine probabilities with
+Wilson score confidence intervals.
+"""
+
+from math import comb, sqrt
+
+Z_95 = 1.959963984540054  # two-sided 95% normal quantile
+
+
+def weighted_choice(rng, weights):
+    """Return a key of {key: int weight} with probability proportional to its weight."""
+    r = rng.randrange(sum(weights.values()))
+    for key, w in weights.items():
+        r -= w
+        if r < 0:
+            return key
+    raise ValueError("weights must be positive")
+
+
+def multiply_mine_polynomials(p, q):
+    """Convolve two {mines: count} polynomials."""
+    out = {}
+    for a, na in p.items():
+        for b, nb in q.items():
+            out[a + b] = out.get(a + b, 0) + na * nb
+    return out
+
+
+def suffix_products(polys):
+    """suffix[i]: product of polys[i:] (suffix[len(polys)] is {0: 1})."""
+    suffix = [{0: 1}]
+    for poly in reversed(polys):
+        suffix.append(multiply_mine_polynomials(suffix[-1], poly))
+    suffix.reverse()
+    return suffix
+
+
+class EnumeratedSampler:
+    """Cluster sampler over an explicit list of solutions (packed ints)."""
+
+    def __init__(self, solutions):
+        self.by_mines = {}
+        for mines in solutions:
+            self.by_mines.setdefault(mines.bit_count(), []).append(mines)
+        self.counts = {k: len(sols) for k, sols in self.by_mines.items()}
+
+    def sample(self, mines, rng):
+        return rng.choice(self.by_mines[mines])
+
+
+class ConfigurationSampler:
+    """
+    Draw configurations of independent clusters uniformly, or weighted by the
+    ways to place the remaining mines in the sea when mines_left is given.
+
+    cluster_samplers: one object per cluster with `counts` ({mines: n}) and
+    `sample(mines, rng)` returning a packed int over that cluster's cells.
+    Raises ValueError when no configuration is possible.
+    """
+
+    def __init__(self, cluster_samplers, sea_count=0, mines_left=None):
+        self.samplers = cluster_samplers
+        self.sea_count = sea_count
+        self.mines_left = mines_left
+        self.suffix = suffix_products([sampler.counts for sampler in cluster_samplers])
+        self.totals = {t: n * self.sea_ways(t) for t, n in self.suffix[0].items()}
+        self.totals = {t: w for t, w in self.totals.items() if w}
+        if not self.totals:
+            raise ValueError("no configuration fits the constraints")
+
+    def sea_ways(self, outline_mines):
+        """Ways to place the mines left over by the outline in the sea (1 if unknown)."""
+        if self.mines_left is None:
+            return 1
+        rest = self.mines_left - outline_mines
+        return comb(self.sea_count, rest) if 0 <= rest <= self.sea_count else 0
+
+    def total(self):
+        """Number of configurations (sea placements included when weighted)."""
+        return sum(self.totals.values())
+
+    def sample(self, rng):
+        """Return (per-cluster packed solutions, number of outline mines)."""
+        outline_mines = left = weighted_choice(rng, self.totals)
+        solutions = []
+        for i, sampler in enumerate(self.samplers):
+            later = self.suffix[i + 1]
+            k = weighted_choice(rng, {k: n * later[left - k]
+                                      for k, n in sampler.counts.items() if left - k in later})
+            solutions.append(sampler.sample(k, rng))
+            left -= k
+        return solutions, outline_mines
+
+
+def wilson_interval(hits, n, z=Z_95):
+    """Wilson score interval for a binomial proportion hits / n."""
+    if not n:
+        return 0.0, 1.0
+    p = hits / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+class SampleStatistics:
+    """Running mine tallies over drawn configurations."""
+
+    def __init__(self, sizes):
+        self.n = 0
+        self.hits = [[0] * size for size in sizes]
+        self.sea_sum = 0.0
+        self.sea_sq = 0.0
+
+    def add(self, solutions, sea_probability=None):
+        """Record one configuration; sea_probability is its per-cell sea mine chance."""
+        self.n += 1
+        for hits, mines in zip(self.hits, solutions):
+            while mines:
+                low = mines & -mines
+                hits[low.bit_length() - 1] += 1
+                mines ^= low
+        if sea_probability is not None:
+            self.sea_sum += sea_probability
+            self.sea_sq += sea_probability * sea_probability
+
+    def cell_estimates(self, z=Z_95):
+        """Per cluster, a list of (estimate, low, high) for each of its cells."""
+        return [[(h / self.n, *wilson_interval(h, self.n, z)) for h in hits] for hits in self.hits]
+
+    def sea_estimate(self, z=Z_95):
+        """(estimate, low, high) for a sea cell: mean of the per-draw chances, normal interval."""
+        mean = self.sea_sum / self.n
+        var = max(0.0, self.sea_sq / self.n - mean * mean)
+        half = z * sqrt(var / self.n)
+        return mean, max(0.0, mean - half), min(1.0, mean + half)
+
+
+def draw_configurations(sampler, count, rng, statistics=None):
+    """Yield `count` configurations from sampler, recording them in statistics."""
+    for _ in range(count):
+        solutions, outline_mines = sampler.sample(rng)
+        if statistics is not None:
+            sea = None
+            if sampler.mines_left is not None and sampler.sea_count:
+                sea = (sampler.mines_left - outline_mines) / sampler.sea_count
+            statistics.add(solutions, sea)
+        yield solutions
@@ -4,22 +4,91 @@ Simple HTTP server to serve the Minesweeper Solver webapp.
 This avoids CORS issues that occur when using the file:// protocol.
 
 Usage:
-    python3 serve.py [port]
+    python3 serve.py [port] [--workers N] [--timeout SECONDS] [--production [--precompress]]
 
 Default port is 8000.
+
+By default (development) every response is sent with caching disabled, so
+edits show up on reload. With --production, static files are served for
+deployment instead:
+
+- .br and .gz variants found next to a file are sent as is when the
+  client's Accept-Encoding allows them (brotli first) and they are not
+  older than the file; with --precompress, missing or stale ones are
+  written for each web asset (PRECOMPRESS_SUFFIXES) at startup, .br only
+  when the brotli package is installed;
+- responses carry an ETag and Last-Modified, and conditional requests
+  (If-None-Match, If-Modified-Since) are answered with 304;
+- versioned URLs (with a v= query parameter, e.g. app.js?v=3.6) may be
+  cached for VERSIONED_MAX_AGE seconds, other files are revalidated each
+  time (no-cache, usually a 304);
+- connections are kept alive (HTTP/1.1) and directories are not listed.
+
+Besides the static files, the server answers POST /api/solve with the
+Python cluster solver, so the browser does not have to solve large boards
+itself. Request body (JSON):
+
+    {"board": "..1.\\n.12.\\n....", "mines": 10}
+
+`board` is the board text (or a list of row strings) in the usual notation,
+`mines` the optional total mine count. The response is batch_solve.py's
+result (status, outline/cluster/configuration counts, certain cells, best
+guess, timings) plus the solution board and every cell's exact mine
+probability. Requests are handled on threads; the solving itself runs on
+a process pool of --workers processes, at most MAX_PENDING_PER_WORKER
+solves per worker may be queued (more get 503), and the results for the
+last RESULT_CACHE_SIZE distinct boards are kept in memory.
+
+Long solves can run as jobs instead (see solve_jobs.py):
+
+    POST   /api/jobs              same body; 202 with {"id": ...}
+    GET    /api/jobs/ID           status, latest progress, result when done
+    GET    /api/jobs/ID/events    Server-Sent Events: analysed, progress,
+                                  cluster, then done/cancelled/timeout/error
+    DELETE /api/jobs/ID           cancel (e.g. when the board is edited)
+
+--workers is the number of solves running at once, /api/solve requests
+and jobs together: both take their turn from the JobManager's slots, so
+mixed load never runs more solver processes than that. The event stream
+honours Last-Event-ID, so a reconnecting browser does not miss events.
 """
 
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timezone
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import email.utils
+import gzip
 import http.server
-import socketserver
-import sys
+import itertools
+import json
 import os
+import sys
+import threading
+
+try:
+    import brotli
+except ImportError:  # brotli not installed: only gzip variants are written
+    brotli = None
+
+from batch_solve import init_worker, solve_rows
+from solve_jobs import JobManager, JobQueueFull, worker_context
+
+DEFAULT_TIMEOUT = 30  # seconds allowed per solve
+MAX_PENDING_PER_WORKER = 4  # queued or running solves per worker before 503
+RESULT_CACHE_SIZE = 128  # distinct (board, mines) results kept in memory
+MAX_BODY_BYTES = 1 << 20  # largest accepted request body
+MAX_BOARD_CELLS = 100_000  # largest accepted board
+VERSIONED_MAX_AGE = 365 * 24 * 3600  # seconds a versioned asset may be cached (production)
+PRECOMPRESS_SUFFIXES = ('.html', '.js', '.css', '.svg', '.json')  # web assets worth compressing
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))  # content codings served, preferred first
+KEEP_ALIVE_TIMEOUT = 30  # seconds an idle keep-alive connection is held (production)
 
 # Change to the script directory
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-# Get port from command line argument or use default
-PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
-
 # Create handler
 Handler = http.server.SimpleHTTPRequestHandler
 
@@ -30,30 +99,463 @@ Handler.extensions_map.update({
     '.css': 'text/css',
 })
 
-class NoCacheHTTPRequestHandler(Handler):
+
+class ResultCache:
+    """Thread-safe LRU of recent solve results."""
+
+    def __init__(self, size=RESULT_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+class SolverServer(http.server.ThreadingHTTPServer):
+    """Threaded HTTP server owning the solver process pool and result cache."""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, workers, timeout=DEFAULT_TIMEOUT):
+        super().__init__(address, handler)
+        self.workers = workers
+        self.timeout = timeout
+        self.results = ResultCache()
+        self.slots = threading.BoundedSemaphore(workers * MAX_PENDING_PER_WORKER)
+        self.pool_lock = threading.Lock()
+        self.pool = self._new_pool()
+        self.jobs = JobManager(max_running=workers, timeout=timeout)
+
+    def _new_pool(self):
+        # forkserver: never fork this multi-threaded process itself
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=worker_context(),
+                                   initializer=init_worker, initargs=('auto',))
+
+    def solve(self, rows, mines):
+        """
+        Solve on the pool (one retry on a fresh pool if a worker died),
+        holding one of the solve slots it shares with the jobs.
+        """
+        with self.jobs.solve_slot():
+            for attempt in range(2):
+                pool = self.pool
+                try:
+                    return pool.submit(solve_rows, rows, mines, self.timeout, True).result()
+                except BrokenProcessPool:
+                    with self.pool_lock:
+                        if self.pool is pool:
+                            self.pool = self._new_pool()
+                    if attempt:
+                        raise
+
+    def server_close(self):
+        super().server_close()
+        self.jobs.close()
+        self.pool.shutdown(cancel_futures=True)
+
+
+def parse_solve_request(body):
+    """(rows, mines) from a /api/solve JSON body; ValueError when malformed."""
+    request = json.loads(body)
+    if not isinstance(request, dict):
+        raise ValueError("expected a JSON object")
+    board = request.get("board")
+    if isinstance(board, str):
+        rows = board.strip().splitlines()
+    elif isinstance(board, list) and all(isinstance(row, str) for row in board):
+        rows = board
+    else:
+        raise ValueError("'board' must be a string or a list of row strings")
+    rows = [row.rstrip("\r") for row in rows]
+    if not rows or not rows[0]:
+        raise ValueError("the board is empty")
+    if any(len(row) != len(rows[0]) for row in rows):
+        raise ValueError("all board rows must have the same length")
+    if len(rows) * len(rows[0]) > MAX_BOARD_CELLS:
+        raise ValueError(f"boards are limited to {MAX_BOARD_CELLS} cells")
+    mines = request.get("mines")
+    if mines is not None and (not isinstance(mines, int) or isinstance(mines, bool) or mines < 0):
+        raise ValueError("'mines' must be a non-negative integer")
+    return rows, mines
+
+
+def precompress(directory='.'):
+    """
+    Write the .gz (and, with brotli, .br) variant of every web asset in
+    directory that lacks an up-to-date one; returns how many were written.
+    """
+    compressors = [('.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+    if brotli is not None:
+        compressors.insert(0, ('.br', lambda data: brotli.compress(data, quality=11)))
+    written = 0
+    with os.scandir(directory) as entries:
+        assets = [entry for entry in entries
+                  if entry.is_file() and entry.name.endswith(PRECOMPRESS_SUFFIXES)]
+    for entry in assets:
+        data = None
+        for suffix, compress in compressors:
+            target = entry.path + suffix
+            try:
+                if os.stat(target).st_mtime_ns >= entry.stat().st_mtime_ns:
+                    continue
+            except FileNotFoundError:
+                pass
+            if data is None:
+                with open(entry.path, 'rb') as f:
+                    data = f.read()
+            tmp = os.path.join(directory, f".{entry.name}{suffix}.tmp")
+            with open(tmp, 'wb') as f:
+                f.write(compress(data))
+            os.replace(tmp, target)
+            written += 1
+    return written
+
+
+def accepted_encodings(header):
+    """Content codings an Accept-Encoding header allows (q > 0)."""
+    accepted = set()
+    for item in (header or '').split(','):
+        name, _, params = item.partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name.strip() and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class SolverRequestHandler(Handler):
+    """Static files plus the solve API; subclasses decide how files are cached."""
+
+    def send_json(self, code, payload, headers=()):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_solve_request(self):
+        """(rows, mines) of the request body, or None after answering 400/413."""
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True  # the body cannot be delimited
+            self.send_json(400, {"error": "invalid Content-Length"})
+            return None
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True  # the body is left unread
+            self.send_json(413, {"error": f"request bodies are limited to {MAX_BODY_BYTES} bytes"})
+            return None
+        try:
+            return parse_solve_request(self.rfile.read(length))
+        except ValueError as e:  # includes malformed JSON
+            self.send_json(400, {"error": str(e)})
+            return None
+
+    def job_route(self):
+        """(job id, rest of the path) for /api/jobs/ID[/...], else None."""
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        if len(parts) >= 3 and parts[:2] == ['api', 'jobs']:
+            return parts[2], '/'.join(parts[3:])
+        return None
+
+    def do_GET(self):
+        route = self.job_route()
+        if route is None:
+            super().do_GET()
+        elif route[1] == '':
+            job = self.server.jobs.get(route[0])
+            if job is None:
+                self.send_json(404, {"error": f"no such job: {route[0]}"})
+            else:
+                self.send_json(200, job)
+        elif route[1] == 'events':
+            self.stream_job_events(route[0])
+        else:
+            self.send_json(404, {"error": f"no such endpoint: {self.path}"})
+
+    def do_DELETE(self):
+        route = self.job_route()
+        if route is None or route[1]:
+            self.send_json(404, {"error": f"no such endpoint: {self.path}"})
+            return
+        asked = self.server.jobs.cancel(route[0])
+        if asked is None:
+            self.send_json(404, {"error": f"no such job: {route[0]}"})
+        elif not asked:
+            self.send_json(409, {"error": "the job has already finished"})
+        else:
+            self.send_json(202, {"id": route[0], "status": "cancelling"})
+
+    def stream_job_events(self, job_id):
+        """Follow a job as Server-Sent Events until its final event."""
+        try:
+            start = int(self.headers.get('Last-Event-ID', -1)) + 1
+        except ValueError:
+            start = 0
+        events = self.server.jobs.events(job_id, start)
+        try:
+            first = next(events, None)
+        except KeyError:
+            self.send_json(404, {"error": f"no such job: {job_id}"})
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('X-Accel-Buffering', 'no')  # no proxy buffering
+        self.end_headers()
+        self.close_connection = True  # the stream has no length: it ends with the connection
+        try:
+            for event in itertools.chain([first], events):
+                if event is None:
+                    self.wfile.write(b": keep-alive\n\n")
+                else:
+                    self.wfile.write(f"id: {event['seq']}\nevent: {event['event']}\n"
+                                     f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the browser went away; the job goes on
+        except KeyError:
+            pass  # the job was pruned while we were following it
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/api/jobs':
+            request = self.read_solve_request()
+            if request is None:
+                return
+            try:
+                job_id = self.server.jobs.submit(*request)
+            except JobQueueFull as e:
+                self.send_json(503, {"error": f"too many jobs: {e}"}, headers=[('Retry-After', '5')])
+                return
+            self.send_json(202, {"id": job_id, "status": "queued",
+                                 "events": f"/api/jobs/{job_id}/events"})
+            return
+        if path != '/api/solve':
+            self.close_connection = True  # the body is left unread
+            self.send_json(404, {"error": f"no such endpoint: {self.path}"})
+            return
+        request = self.read_solve_request()
+        if request is None:
+            return
+        rows, mines = request
+
+        key = ("\n".join(rows), mines)
+        result = self.server.results.get(key)
+        if result is not None:
+            self.send_json(200, dict(result, cached=True))
+            return
+        if not self.server.slots.acquire(blocking=False):
+            self.send_json(503, {"error": "the solver is busy, try again shortly"},
+                           headers=[('Retry-After', '1')])
+            return
+        try:
+            result = self.server.solve(rows, mines)
+        except BrokenProcessPool:
+            self.send_json(500, {"error": "the solver process died"})
+            return
+        finally:
+            self.server.slots.release()
+
+        if result["status"] in ("ok", "no-solution"):
+            self.server.results.put(key, result)
+            self.send_json(200, dict(result, cached=False))
+        elif result["status"] == "timeout":
+            self.send_json(504, result)
+        else:
+            self.send_json(422, result)  # the solve itself failed
+
+
+class NoCacheHTTPRequestHandler(SolverRequestHandler):
+    """Development mode: nothing is cached, so edits show up on reload."""
+
     def end_headers(self):
         self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate')
         self.send_header('Expires', '0')
         super().end_headers()
 
-# Start server
-with socketserver.TCPServer(("", PORT), NoCacheHTTPRequestHandler) as httpd:
-    print(f"╔══════════════════════════════════════════════════════════╗")
-    print(f"║  Minesweeper Solver Web Server                          ║")
-    print(f"╚══════════════════════════════════════════════════════════╝")
-    print(f"")
-    print(f"  Server running at: http://localhost:{PORT}/")
-    print(f"")
-    print(f"  Open this URL in your browser:")
-    print(f"    → http://localhost:{PORT}/minesweeper-solver.html")
-    print(f"")
-    print(f"  Press Ctrl+C to stop the server")
-    print(f"")
-    print(f"─────────────────────────────────────────────────────────")
-
-    try:
-        httpd.serve_forever()
-    except KeyboardInterrupt:
-        print("\n\n  Server stopped.")
-        sys.exit(0)
 
+class ProductionHTTPRequestHandler(SolverRequestHandler):
+    """
+    Production mode: precompressed variants, ETag/Last-Modified with 304
+    answers, long-lived caching of versioned URLs, keep-alive connections.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEP_ALIVE_TIMEOUT
+
+    def parse_request(self):
+        self.cache_control = 'no-store'  # API answers and errors; send_head sets the files'
+        return super().parse_request()
+
+    def end_headers(self):
+        self.send_header('Cache-Control', self.cache_control)
+        super().end_headers()
+
+    def list_directory(self, path):
+        self.send_error(404, "File not found")
+        return None
+
+    def send_head(self):
+        url = urlsplit(self.path)
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, 'index.html')
+            if not url.path.endswith('/') or not os.path.isfile(index):
+                return super().send_head()  # redirect to the slash URL, or 404
+            path = index
+        elif url.path.endswith('/'):
+            self.send_error(404, "File not found")
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+
+        body_path, size, coding = path, stat.st_size, None
+        accepted = accepted_encodings(self.headers.get('Accept-Encoding'))
+        for name, suffix in ENCODINGS:
+            if name not in accepted and '*' not in accepted:
+                continue
+            try:
+                variant = os.stat(path + suffix)
+            except OSError:
+                continue
+            if variant.st_mtime_ns >= stat.st_mtime_ns:  # not stale
+                body_path, size, coding = path + suffix, variant.st_size, name
+                break
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + coding if coding else ""}"'
+        if 'v' in parse_qs(url.query):
+            self.cache_control = f'public, max-age={VERSIONED_MAX_AGE}, immutable'
+        else:
+            self.cache_control = 'no-cache'  # revalidate: usually a 304
+
+        if self.not_modified(etag, stat.st_mtime):
+            self.send_response(304)
+            self.send_validators(etag, stat.st_mtime)
+            self.end_headers()
+            return None
+        try:
+            f = open(body_path, 'rb')
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        self.send_response(200)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Length', str(size))
+        if coding:
+            self.send_header('Content-Encoding', coding)
+        self.send_validators(etag, stat.st_mtime)
+        self.end_headers()
+        return f
+
+    def send_validators(self, etag, mtime):
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', self.date_time_string(mtime))
+        self.send_header('Vary', 'Accept-Encoding')
+
+    def not_modified(self, etag, mtime):
+        """Whether the request's validators show the client has this version."""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:  # takes precedence over If-Modified-Since
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if not if_modified_since:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return int(mtime) <= since.timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Minesweeper Solver webapp.")
+    parser.add_argument("port", nargs="?", type=int, default=8000, help="port (default 8000)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="solves running at once, /api/solve requests and jobs "
+                             "together (0, the default: one per core)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"seconds allowed per solve (default {DEFAULT_TIMEOUT})")
+    parser.add_argument("--production", action="store_true",
+                        help="serve static files compressed, with ETags and caching "
+                             "(default: development mode, nothing cached)")
+    parser.add_argument("--precompress", action="store_true",
+                        help="with --production: write missing or stale .gz/.br variants "
+                             "next to the web assets at startup")
+    args = parser.parse_args()
+    if args.precompress and not args.production:
+        parser.error("--precompress only applies with --production")
+    if args.workers < 0:
+        parser.error("--workers must be 0 (one per core) or more")
+    if args.workers == 0:
+        args.workers = os.cpu_count() or 1
+    PORT = args.port
+
+    if args.production:
+        handler = ProductionHTTPRequestHandler
+        if args.precompress:
+            written = precompress()
+            mode = (f"production ({written} compressed variant(s) written"
+                    f"{'' if brotli is not None else ', gzip only: brotli not installed'})")
+        else:
+            mode = "production (existing compressed variants only)"
+    else:
+        handler = NoCacheHTTPRequestHandler
+        mode = "development (caching disabled)"
+
+    # Start server
+    with SolverServer(("", PORT), handler, args.workers, args.timeout) as httpd:
+        print(f"╔══════════════════════════════════════════════════════════╗")
+        print(f"║  Minesweeper Solver Web Server                          ║")
+        print(f"╚══════════════════════════════════════════════════════════╝")
+        print(f"")
+        print(f"  Server running at: http://localhost:{PORT}/")
+        print(f"  Mode: {mode}")
+        print(f"")
+        print(f"  Open this URL in your browser:")
+        print(f"    → http://localhost:{PORT}/minesweeper-solver.html")
+        print(f"")
+        print(f"  Solve API: POST http://localhost:{PORT}/api/solve "
+              f"({args.workers} worker process(es))")
+        print(f"  Solve jobs: POST http://localhost:{PORT}/api/jobs (progress over SSE)")
+        print(f"")
+        print(f"  Press Ctrl+C to stop the server")
+        print(f"")
+        print(f"─────────────────────────────────────────────────────────")
+
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\n\n  Server stopped.")
+            sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+solve_jobs.py
+
+Asynchronous solve jobs with progress events and cooperative cancellation
+(used by serve.py).
+
+A job is one board (and optional mine count) solved by
+batch_solve.solve_rows in a worker process of its own, forked from a
+forkserver that has the solver modules imported already. JobManager runs
+an asyncio event loop on a background thread:
+
+- submit() queues a job and returns its id. At most max_running jobs solve
+  at once (an asyncio.Semaphore) and at most max_queued wait for a slot;
+  more are refused with JobQueueFull, so heavy solves cannot pile up.
+  Solves run elsewhere can hold a slot too (solve_slot()), so that one
+  limit covers every solver process.
+- The worker sends events through a pipe that the loop watches with
+  add_reader: "analysing" (one per analysis stage, with its log message),
+  "analysed" (outline and cluster sizes), "progress" (search nodes so far
+  in the current cluster, plus the solutions found so far unless the
+  cluster is counted by the component cache, at most every
+  PROGRESS_MIN_INTERVAL seconds), "cluster" (one more cluster counted),
+  and finally one of "done" (with the result), "cancelled", "timeout" or
+  "error". Progress events also carry clusters and clusters_done.
+- cancel() sets the job's multiprocessing Event. The worker checks it
+  between analysis stages, between clusters and every PROGRESS_INTERVAL
+  search nodes and stops cleanly. A single analysis stage (propagation,
+  say) cannot be interrupted: a worker still running CANCEL_GRACE seconds
+  later is terminated. A queued job is dropped at once.
+- events() lets a plain (threaded) HTTP handler follow a job: it replays
+  the events so far, then blocks for new ones.
+
+The last KEEP_FINISHED finished jobs are kept for status queries.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import asyncio
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+
+from batch_solve import DEFAULT_TIMEOUT, Cancelled, init_worker, solve_rows
+
+PROGRESS_MIN_INTERVAL = 0.25  # seconds between "progress" events of one job
+CANCEL_GRACE = 5  # seconds a cancelled worker gets to stop before it is terminated
+KEEP_FINISHED = 100  # finished jobs kept for status queries
+QUEUED_PER_RUNNING = 8  # default queue length per concurrently running job
+HEARTBEAT = 15  # seconds events() waits before yielding None
+FINAL_EVENTS = ("done", "cancelled", "timeout", "error")
+_FINAL_EVENT = {"ok": "done", "no-solution": "done", "cancelled": "cancelled",
+                "timeout": "timeout", "error": "error"}
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def worker_context():
+    """Start method for solver processes: a forkserver with the solver preloaded."""
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["batch_solve"])
+    return context
+
+
+def _job_worker(conn, cancel, rows, mines, timeout, cache):
+    """Worker process body: solve one board, sending events through conn."""
+    init_worker('auto', cache)
+    last = 0.0
+
+    def progress(event):
+        nonlocal last
+        if cancel.is_set():
+            raise Cancelled()
+        if event["event"] == "progress":
+            now = time.monotonic()
+            if now - last < PROGRESS_MIN_INTERVAL:
+                return
+            last = now
+        conn.send(event)
+
+    try:
+        result = solve_rows(rows, mines, timeout, details=True, progress=progress)
+        conn.send({"event": _FINAL_EVENT[result["status"]], "result": result})
+    finally:
+        conn.close()
+
+
+class Job:
+    """One job; only touched from the manager's event loop."""
+
+    def __init__(self, job_id, rows, mines, cancel):
+        self.id = job_id
+        self.rows = rows
+        self.mines = mines
+        self.cancel = cancel
+        self.status = "queued"  # then "running", then one of FINAL_EVENTS
+        self.created = time.time()
+        self.events = []
+        self.progress = {}
+        self.result = None
+        self.task = None
+        self.process = None
+        self.changed = asyncio.Event()  # replaced by a fresh one after every event
+
+    def snapshot(self):
+        return {"id": self.id, "status": self.status, "created": self.created,
+                "progress": dict(self.progress), "result": self.result}
+
+
+class JobManager:
+    """
+    Solve jobs on worker processes, driven by an asyncio loop on its own
+    thread. The public methods are thread-safe and blocking, for use from
+    the threads of an http.server.
+
+    max_running: jobs solving at once (default: one per core); max_queued:
+    jobs allowed to wait (default QUEUED_PER_RUNNING per running slot);
+    timeout: seconds per job; cache: optional cluster store path.
+    """
+
+    def __init__(self, max_running=None, max_queued=None, timeout=DEFAULT_TIMEOUT, cache=None):
+        self.max_running = max_running or os.cpu_count() or 1
+        self.max_queued = (max_queued if max_queued is not None
+                           else self.max_running * QUEUED_PER_RUNNING)
+        self.timeout = timeout
+        self.cache = cache
+        self.context = worker_context()
+        self.jobs = OrderedDict()
+        self.loop = asyncio.new_event_loop()
+        self.slots = asyncio.Semaphore(self.max_running)
+        self.thread = threading.Thread(target=self.loop.run_forever, name="solve-jobs", daemon=True)
+        self.thread.start()
+
+    # -- thread-safe API ---------------------------------------------------
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def submit(self, rows, mines=None):
+        """Queue a job; returns its id. Raises JobQueueFull."""
+        return self._call(self._submit(rows, mines))
+
+    def cancel(self, job_id):
+        """Ask a job to stop: True if asked, False if already finished, None if unknown."""
+        return self._call(self._cancel(job_id))
+
+    def get(self, job_id):
+        """Status, latest progress and result of a job, or None if unknown."""
+        return self._call(self._get(job_id))
+
+    def events(self, job_id, start=0, heartbeat=HEARTBEAT):
+        """
+        Yield a job's event dicts from number start on, waiting for new ones
+        (None every heartbeat seconds without news); stops after the final
+        event. Each event holds "event", "job", "seq" (its number) and its
+        data. Raises KeyError for an unknown job.
+        """
+        while True:
+            waited = self._call(self._wait(job_id, start, heartbeat))
+            if waited is None:
+                raise KeyError(job_id)
+            batch, finished = waited
+            if not batch and not finished:
+                yield None
+            yield from batch
+            start += len(batch)
+            if finished:
+                return
+
+    @contextmanager
+    def solve_slot(self):
+        """
+        Hold one of the max_running slots (blocking until one is free) while
+        solving outside the manager, e.g. on serve.py's /api/solve pool.
+        """
+        self._call(self.slots.acquire())
+        try:
+            yield
+        finally:
+            self.loop.call_soon_threadsafe(self.slots.release)
+
+    def close(self):
+        """Cancel every job, stop the workers and the loop."""
+        self._call(self._shutdown())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    # -- event loop side ---------------------------------------------------
+
+    async def _submit(self, rows, mines):
+        active = sum(1 for job in self.jobs.values() if job.status not in FINAL_EVENTS)
+        if active >= self.max_running + self.max_queued:
+            raise JobQueueFull(f"{active} jobs are already queued or running")
+        job = Job(secrets.token_hex(8), rows, mines, self.context.Event())
+        self.jobs[job.id] = job
+        self._emit(job, {"event": "queued"})
+        job.task = self.loop.create_task(self._run(job))
+        return job.id
+
+    async def _cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if job.status in FINAL_EVENTS:
+            return False
+        job.cancel.set()
+        if job.status == "queued":
+            job.task.cancel()
+        else:
+            self.loop.call_later(CANCEL_GRACE, self._terminate, job)
+        return True
+
+    async def _get(self, job_id):
+        job = self.jobs.get(job_id)
+        return None if job is None else job.snapshot()
+
+    async def _wait(self, job_id, start, timeout):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if len(job.events) <= start and job.status not in FINAL_EVENTS:
+            try:
+                await asyncio.wait_for(job.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job.events[start:], job.status in FINAL_EVENTS
+
+    async def _shutdown(self):
+        for job in self.jobs.values():
+            if job.status not in FINAL_EVENTS:
+                job.cancel.set()
+                job.task.cancel()
+                self._terminate(job)
+
+    async def _run(self, job):
+        try:
+            async with self.slots:
+                await self._solve(job)
+        except asyncio.CancelledError:
+            if job.status not in FINAL_EVENTS:
+                self._emit(job, {"event": "cancelled", "result": {"status": "cancelled"}})
+
+    async def _solve(self, job):
+        receiver, sender = self.context.Pipe(duplex=False)
+        job.process = self.context.Process(
+            target=_job_worker, daemon=True,
+            args=(sender, job.cancel, job.rows, job.mines, self.timeout, self.cache))
+        job.process.start()
+        sender.close()
+        job.status = "running"
+        self._emit(job, {"event": "started"})
+
+        finished = self.loop.create_future()
+
+        def on_readable():
+            try:
+                while receiver.poll():
+                    self._emit(job, receiver.recv())
+            except (EOFError, OSError):  # the worker is gone
+                if not finished.done():
+                    finished.set_result(None)
+
+        self.loop.add_reader(receiver.fileno(), on_readable)
+        try:
+            await finished
+        finally:
+            self.loop.remove_reader(receiver.fileno())
+            receiver.close()
+        await self.loop.run_in_executor(None, job.process.join)
+        if job.status not in FINAL_EVENTS:
+            if job.cancel.is_set():  # terminated after CANCEL_GRACE
+                self._emit(job, {"event": "cancelled", "result": {"status": "cancelled"}})
+            else:
+                self._emit(job, {"event": "error", "result": {
+                    "status": "error", "error": f"worker exited with code {job.process.exitcode}"}})
+
+    def _terminate(self, job):
+        if job.process is not None and job.process.is_alive():
+            job.process.terminate()
+
+    def _emit(self, job, event):
+        kind = event["event"]
+        if kind == "analysed":
+            job.progress = {"clusters": event["clusters"], "clusters_done": 0}
+        elif kind in ("progress", "cluster"):
+            done = job.progress.get("clusters_done", 0) + (kind == "cluster")
+            event = dict(event, clusters=job.progress.get("clusters"), clusters_done=done)
+            job.progress = {key: value for key, value in event.items() if key != "event"}
+        elif kind == "started":
+            job.status = "running"
+        elif kind in FINAL_EVENTS:
+            job.status = kind
+            job.result = event.get("result")
+        job.events.append(dict(event, job=job.id, seq=len(job.events)))
+        job.changed.set()
+        job.changed = asyncio.Event()
+        if kind in FINAL_EVENTS:
+            self._prune()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINAL_EVENTS]
+        for job_id in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self.jobs[job_id]